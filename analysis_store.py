@@ -0,0 +1,196 @@
+# DesignEdge.AI - Persistent analysis store
+#
+# Completed analysis runs are kept on disk so they survive browser refreshes
+# and can be reviewed by other users of the same design. Run metadata (project,
+# design fingerprint, material, seed, configuration and a per-test summary)
+# lives in SQLite with indexes for project and design lookups; the result
+# arrays of each run are written as .npy files and memory-mapped on load.
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import contextlib
+
+import numpy as np
+
+STORE_DIR = os.path.join(os.getenv("DESIGNEDGE_DATA_DIR", "data"), "analysis_store")
+INLINE_LIST_LIMIT = 64     # Longer numeric lists are stored as arrays
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    design_key TEXT NOT NULL,
+    created REAL NOT NULL,
+    material TEXT NOT NULL,
+    model_hash TEXT,
+    seed INTEGER,
+    min_safety REAL,
+    compliance TEXT,
+    config_json TEXT NOT NULL,
+    summary_json TEXT NOT NULL,
+    results_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_project_created ON runs (project, created DESC);
+CREATE INDEX IF NOT EXISTS runs_design_created ON runs (design_key, created DESC);
+"""
+
+META_COLUMNS = ("id", "project", "design_key", "created", "material", "model_hash", "seed",
+                "min_safety", "compliance", "config_json", "summary_json")
+
+
+def design_key(**parts):
+    """Stable fingerprint of everything that determines an analysis result"""
+    payload = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _split_arrays(value, arrays):
+    """JSON-safe copy of a result structure with numpy arrays moved into `arrays`"""
+    if isinstance(value, (list, tuple)) and len(value) > INLINE_LIST_LIMIT:
+        candidate = np.asarray(value)
+        if candidate.dtype.kind in "biuf":
+            value = candidate
+
+    if isinstance(value, np.ndarray) and value.dtype.kind == "O":
+        value = value.tolist()
+
+    if isinstance(value, np.ndarray):
+        name = f"a{len(arrays)}"
+        arrays[name] = np.ascontiguousarray(value)
+        return {"__array__": name}
+    if isinstance(value, dict):
+        return {str(key): _split_arrays(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_split_arrays(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _join_arrays(value, load_array):
+    """Inverse of _split_arrays, loading arrays lazily by name"""
+    if isinstance(value, dict):
+        if set(value) == {"__array__"}:
+            return load_array(value["__array__"])
+        return {key: _join_arrays(item, load_array) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_join_arrays(item, load_array) for item in value]
+    return value
+
+
+def summarize_results(results):
+    """Per-test scalars used for history lists and comparisons without loading arrays"""
+    return {
+        test_type: {key: result[key] for key in ("max_stress", "safety_factor", "compliance", "mass_kg") if key in result}
+        for test_type, result in results.items()
+    }
+
+
+class AnalysisStore:
+    """SQLite run index plus per-run directories of memory-mappable arrays"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.runs_dir = os.path.join(root, "runs")
+        os.makedirs(self.runs_dir, exist_ok=True)
+        self.db_path = os.path.join(root, "analysis.sqlite")
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across threads and app processes
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save_run(self, project, design, material, model_hash, seed, config, results):
+        """Persist a completed analysis and return its run id"""
+        run_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        arrays = {}
+        results_json = json.dumps(_split_arrays(results, arrays))
+
+        # Write arrays into a temporary directory and move it into place atomically
+        staging = os.path.join(self.runs_dir, f".{run_id}.tmp")
+        os.makedirs(staging, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array, allow_pickle=False)
+        os.replace(staging, os.path.join(self.runs_dir, run_id))
+
+        summary = summarize_results(results)
+        safety_factors = [values["safety_factor"] for values in summary.values() if "safety_factor" in values]
+        compliance = "PASS" if all(values.get("compliance") == "PASS" for values in summary.values()) else "FAIL"
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, project, design, time.time(), material, model_hash, seed,
+                 min(safety_factors) if safety_factors else None, compliance,
+                 json.dumps(config, default=repr), json.dumps(summary), results_json)
+            )
+        return run_id
+
+    def _meta(self, row):
+        meta = {column: row[column] for column in META_COLUMNS}
+        meta["config"] = json.loads(meta.pop("config_json"))
+        meta["summary"] = json.loads(meta.pop("summary_json"))
+        return meta
+
+    def find_run(self, design):
+        """Most recent run of a design (indexed lookup), or None"""
+        with self._connect() as connection:
+            row = connection.execute(
+                f"SELECT {', '.join(META_COLUMNS)} FROM runs WHERE design_key = ? ORDER BY created DESC LIMIT 1",
+                (design,)
+            ).fetchone()
+        return self._meta(row) if row else None
+
+    def list_runs(self, project=None, limit=50):
+        """Run metadata, newest first, optionally for one project"""
+        query = f"SELECT {', '.join(META_COLUMNS)} FROM runs"
+        params = ()
+        if project is not None:
+            query += " WHERE project = ?"
+            params = (project,)
+        query += " ORDER BY created DESC LIMIT ?"
+        with self._connect() as connection:
+            rows = connection.execute(query, params + (limit,)).fetchall()
+        return [self._meta(row) for row in rows]
+
+    def projects(self):
+        """Names of all projects with stored runs"""
+        with self._connect() as connection:
+            return [row[0] for row in connection.execute("SELECT DISTINCT project FROM runs ORDER BY project")]
+
+    def load_run(self, run_id):
+        """Run metadata plus its results, with arrays memory-mapped read-only"""
+        with self._connect() as connection:
+            row = connection.execute(
+                f"SELECT {', '.join(META_COLUMNS)}, results_json FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        directory = os.path.join(self.runs_dir, run_id)
+        meta = self._meta(row)
+        meta["results"] = _join_arrays(
+            json.loads(row["results_json"]),
+            lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        )
+        return meta
+
+    def delete_run(self, run_id):
+        """Remove a run and its arrays"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        shutil.rmtree(os.path.join(self.runs_dir, run_id), ignore_errors=True)
@@ -0,0 +1,280 @@
+# DesignEdge.AI - Static asset server
+#
+# Serves GLB models and the vendored Three.js viewer scripts to the 3D viewer
+# iframe. The iframe is injected as srcdoc HTML, so relative paths do not
+# resolve and nothing is cached between renders; this server gives every asset
+# a stable, versioned URL with ETag / Cache-Control and gzip/brotli encoding.
+
+import os
+import sys
+import gzip
+import hashlib
+import logging
+import tempfile
+import mimetypes
+import threading
+import collections
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_DIR = os.getenv("DESIGNEDGE_ASSET_DIR", "static")
+VENDOR_DIR = os.path.join(ASSET_DIR, "vendor")
+ASSET_HOST = os.getenv("DESIGNEDGE_ASSET_HOST", "0.0.0.0")
+ASSET_PORT = int(os.getenv("DESIGNEDGE_ASSET_PORT", "8502"))
+# Base URL browsers load assets from: a path such as /assets when a reverse proxy routes it to this
+# server on the app's origin, or an absolute URL. The localhost default only suits a local `streamlit run`.
+ASSET_PUBLIC_URL = os.getenv("DESIGNEDGE_ASSET_URL", f"http://localhost:{ASSET_PORT}").rstrip("/")
+
+# Viewer scripts vendored into static/vendor on first start (CDN used only until they are)
+VENDOR_SCRIPTS = {
+    "three.min.js": "https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js",
+    "GLTFLoader.js": "https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/loaders/GLTFLoader.js",
+    "OrbitControls.js": "https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/controls/OrbitControls.js",
+}
+
+COMPRESSIBLE_EXTENSIONS = {".js", ".json", ".glb", ".bin", ".css", ".html"}
+VERSIONED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UNVERSIONED_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+PUBLISHED_PREFIX = "published"
+ETAG_CACHE_ENTRIES = 4096
+ENCODED_CACHE_BYTES = int(os.getenv("DESIGNEDGE_ASSET_CACHE_MB", "64")) * (1 << 20)
+
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("application/javascript", ".js")
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping bounded by entry count and total value size"""
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._bytes -= len(self._items.pop(key))
+            self._items[key] = value
+            self._bytes += size
+            while ((self.max_entries is not None and len(self._items) > self.max_entries)
+                   or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+_published = {}                                            # URL path -> file path for assets outside ASSET_DIR
+_etag_cache = LRUCache(max_entries=ETAG_CACHE_ENTRIES)     # (file path, mtime, size) -> etag
+_encoded_cache = LRUCache(max_bytes=ENCODED_CACHE_BYTES)   # (file path, mtime, encoding) -> compressed body
+_lock = threading.Lock()
+_server = None
+
+
+def file_etag(path):
+    """Content hash of a file, cached by path, modification time and size"""
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime_ns, stat.st_size)
+    etag = _etag_cache.get(cache_key)
+    if etag is None:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+        _etag_cache.put(cache_key, etag)
+    return etag
+
+
+def _encoded_body(path, encoding):
+    """Compressed file contents, cached so each asset is only compressed once"""
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime_ns, encoding)
+    body = _encoded_cache.get(cache_key)
+    if body is None:
+        with open(path, "rb") as f:
+            raw = f.read()
+        if encoding == "br":
+            body = brotli.compress(raw)
+        else:
+            body = gzip.compress(raw, compresslevel=6)
+        _encoded_cache.put(cache_key, body)
+    return body
+
+
+def _resolve(url_path):
+    """Map a request path onto a published file or a file below ASSET_DIR"""
+    url_path = unquote(url_path).lstrip("/")
+    if url_path in _published:
+        return _published[url_path]
+
+    root = os.path.realpath(ASSET_DIR)
+    candidate = os.path.realpath(os.path.join(root, url_path))
+    if candidate.startswith(root + os.sep) and os.path.isfile(candidate):
+        return candidate
+    return None
+
+
+class AssetRequestHandler(BaseHTTPRequestHandler):
+    """GET/HEAD handler with ETag revalidation and content negotiation"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        parts = urlsplit(self.path)
+        path = _resolve(parts.path)
+        if path is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+
+        etag = f'"{file_etag(path)}"'
+        cache_control = VERSIONED_CACHE_CONTROL if "v" in parse_qs(parts.query) else UNVERSIONED_CACHE_CONTROL
+
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+
+        accepted = self.headers.get("Accept-Encoding", "")
+        encoding = None
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            if brotli is not None and "br" in accepted:
+                encoding = "br"
+            elif "gzip" in accepted:
+                encoding = "gzip"
+
+        if encoding:
+            body = _encoded_body(path, encoding)
+        else:
+            with open(path, "rb") as f:
+                body = f.read()
+
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_asset_server(host=ASSET_HOST, port=ASSET_PORT):
+    """Start the asset server in a daemon thread (once per process)"""
+    global _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), AssetRequestHandler)
+            except OSError:
+                # Port already bound, typically by another app process serving the same assets
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="asset-server", daemon=True).start()
+            if not all(os.path.isfile(os.path.join(VENDOR_DIR, name)) for name in VENDOR_SCRIPTS):
+                threading.Thread(target=_vendor_missing_scripts, name="asset-vendor", daemon=True).start()
+    return _server
+
+
+def publish_file(path, name=None):
+    """Expose a file outside ASSET_DIR and return its versioned URL
+
+    The URL path contains the content hash, so different files published
+    under the same name get different URLs.
+    """
+    path = os.path.realpath(path)
+    name = name or os.path.basename(path)
+    version = file_etag(path)[:12]
+    url_path = f"{PUBLISHED_PREFIX}/{version}/{name}"
+    with _lock:
+        _published[url_path] = path
+    return f"{ASSET_PUBLIC_URL}/{url_path}?v={version}"
+
+
+def asset_url(relative_path):
+    """Versioned URL of a file below ASSET_DIR"""
+    path = os.path.join(ASSET_DIR, relative_path)
+    return f"{ASSET_PUBLIC_URL}/{relative_path}?v={file_etag(path)[:12]}"
+
+
+def script_url(name):
+    """URL of a viewer script: vendored copy when present, CDN otherwise"""
+    if os.path.isfile(os.path.join(VENDOR_DIR, name)):
+        return asset_url(f"vendor/{name}")
+    return VENDOR_SCRIPTS[name]
+
+
+def vendor_viewer_scripts():
+    """Download the Three.js viewer scripts into static/vendor"""
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    for name, url in VENDOR_SCRIPTS.items():
+        target = os.path.join(VENDOR_DIR, name)
+        if not os.path.isfile(target):
+            # Written under a temporary name so a failed download is never served
+            fd, temp_path = tempfile.mkstemp(dir=VENDOR_DIR, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f, urllib.request.urlopen(url, timeout=30) as response:
+                    f.write(response.read())
+                os.replace(temp_path, target)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            print(f"Vendored {name}")
+
+
+def _vendor_missing_scripts():
+    try:
+        vendor_viewer_scripts()
+    except OSError as e:
+        # Offline first start: the viewer keeps loading from the CDN until a later start succeeds
+        logger.warning("Could not vendor the viewer scripts: %s", e)
+
+
+if __name__ == "__main__":
+    if "--vendor" in sys.argv:
+        vendor_viewer_scripts()
+    else:
+        # Extra arguments are files outside ASSET_DIR to publish (e.g. the bundled packet.glb)
+        for path in sys.argv[1:]:
+            print(f"Published {publish_file(path)}")
+        start_asset_server()
+        print(f"Serving {ASSET_DIR} on {ASSET_HOST}:{ASSET_PORT}")
+        threading.Event().wait()
@@ -0,0 +1,392 @@
+# DesignEdge.AI - Benchmark suite
+#
+# Times the simulation entry points over a sweep of problem sizes (route
+# length, frequency resolution, buckling grid, mesh size, optimizer grid,
+# library size) and records wall time, peak traced memory and the memory
+# blocks still held after a call. Results are compared against
+# benchmark_baseline.json, committed with the repository, and any benchmark
+# whose fastest repeat is slower, or whose peak memory is higher, than the
+# baseline by more than the threshold (and a small absolute margin) is
+# reported as a regression (exit status 1). A missing baseline file exits
+# with status 2 so an unconfigured check cannot pass.
+#
+#   python benchmarks.py                      # full sweep, compare with the baseline
+#   python benchmarks.py --quick              # small sizes only
+#   python benchmarks.py --only vibration_response,fea_results
+#   python benchmarks.py --save-baseline      # record the current numbers as the baseline
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+
+# Keep pyramids and model files written by the benchmarks out of the real data directory
+os.environ.setdefault("DESIGNEDGE_DATA_DIR", tempfile.mkdtemp(prefix="designedge-bench-"))
+
+import numpy as np
+import pandas as pd
+import trimesh
+
+import fatigue
+import fea_utils
+import load_cases
+import material_library
+import route_library
+import spectral
+import track_import
+
+BASELINE_FILE = os.getenv("DESIGNEDGE_BENCHMARK_BASELINE", "benchmark_baseline.json")
+REGRESSION_THRESHOLD = 0.25    # Relative slowdown / memory growth flagged as a regression
+MIN_TIME_DELTA_SECONDS = 0.005     # ... when it is also at least this much slower (timer and scheduler noise)
+MIN_MEMORY_DELTA_BYTES = 1 << 20   # ... or needs at least this much more memory
+MIN_REPEATS = 5
+MIN_TIME_SECONDS = 2.0         # Repeat fast benchmarks until this much time was measured
+BENCHMARK_SEED = 1234
+
+# name -> {"factory": size -> callable, "sizes": full sweep, "quick": quick sweep, "unit": size label}
+BENCHMARKS = {}
+
+
+def benchmark(name, sizes, quick=None, unit=""):
+    """Register a benchmark: the decorated factory takes a problem size and returns the callable to time"""
+    def register(factory):
+        BENCHMARKS[name] = {"factory": factory, "sizes": tuple(sizes), "quick": tuple(quick or sizes[:2]),
+                            "unit": unit}
+        return factory
+    return register
+
+
+def reference_props(material="PP"):
+    return material_library.BUILTIN_MATERIALS[material]
+
+
+@benchmark("transport_simulation", (100, 1000, 10000, 100000), unit="km")
+def bench_transport_simulation(distance_km):
+    def run():
+        load_cases.generate_transport_simulation(distance_km, "Mixed (City + Highway)", max_points=None,
+                                                 rng=random.Random(BENCHMARK_SEED))
+    return run
+
+
+@benchmark("transport_pyramid", (1000, 10000, 100000), unit="km")
+def bench_transport_pyramid(distance_km):
+    transport_data = load_cases.generate_transport_simulation(distance_km, "Mixed (City + Highway)", max_points=None,
+                                                              rng=random.Random(BENCHMARK_SEED))
+
+    def run():
+        # Stored pyramids are reused for identical traces, so drop them to time the build
+        shutil.rmtree(fea_utils.PYRAMID_ROOT, ignore_errors=True)
+        return load_cases.build_transport_overview(transport_data)
+    return run
+
+
+@benchmark("rainflow", (100_000, 1_000_000, 5_000_000), quick=(100_000, 1_000_000), unit="samples")
+def bench_rainflow(samples):
+    history = np.random.default_rng(BENCHMARK_SEED).normal(1.5, 0.4, samples)
+    return lambda: fatigue.rainflow_matrix(history)
+
+
+@benchmark("welch_psd", (100_000, 1_000_000, 5_000_000), quick=(100_000, 1_000_000), unit="samples")
+def bench_welch_psd(samples):
+    history = np.random.default_rng(BENCHMARK_SEED).normal(1.5, 0.4, samples)
+    return lambda: spectral.welch_psd(history, 1.0 / load_cases.TRANSPORT_SAMPLE_SECONDS)
+
+
+@benchmark("route_signature", (1, 10, 100), unit="segments")
+def bench_route_signature(segments):
+    """Custom route composed from stored road-class signatures (signatures computed before timing)"""
+    classes = list(route_library.ROAD_CLASSES)
+    route = [(classes[i % len(classes)], 50.0) for i in range(segments)]
+    load_cases.get_route_signature(route_library.CUSTOM_ROUTE, 50.0 * segments, route)
+    return lambda: load_cases.get_route_signature(route_library.CUSTOM_ROUTE, 50.0 * segments, route)
+
+
+@benchmark("track_replay", (100_000, 1_000_000, 5_000_000), quick=(100_000, 1_000_000), unit="points")
+def bench_track_replay(points):
+    """Resampling and finite differences of an imported track (the import itself runs before timing)"""
+    generator = np.random.default_rng(BENCHMARK_SEED)
+    distance = np.cumsum(generator.uniform(15.0, 30.0, points))
+    path = os.path.join(os.environ["DESIGNEDGE_DATA_DIR"], f"track_{points}.csv")
+    pd.DataFrame({
+        "lat": 45.0 + distance / 111_000.0,
+        "lon": 10.0 + generator.normal(0.0, 1e-5, points),
+        "ele": 300.0 + 200.0 * np.sin(distance / 20_000.0) + generator.normal(0.0, 3.0, points),
+        "speed_kmh": 80.0 + 10.0 * np.sin(distance / 5_000.0),
+    }).to_csv(path, index=False)
+    track = track_import.load_track(track_import.import_track(path))
+    return lambda: track_import.track_accelerations(track)
+
+
+@benchmark("vibration_response", (200, 2000, 20000), unit="points")
+def bench_vibration_response(points):
+    def run():
+        load_cases.generate_vibration_response(1.15, "5-200 Hz", rng=random.Random(BENCHMARK_SEED), points=points)
+    return run
+
+
+# Design the fea_results and recommendation benchmarks analyse (PP walls, every load case configured)
+FIXTURE_TEST_CONFIGS = {
+    "drop": {"height_m": 1.2},
+    "vibration": {"g_force": 1.15, "frequency_range": "5-200 Hz"},
+    "live_transport": {"distance_km": 1000, "route_type": "Mixed (City + Highway)"},
+    "stacking": {"dimensions_m": (0.3, 0.2, 0.25), "wall_thickness_m": 0.0015, "boxes_above": 3,
+                 "box_weight": 1.5, "environment_factor": 1.0},
+}
+
+
+def fixture_inputs(test_type, material="PP"):
+    """Analysis graph inputs of one fixture load case, as analysis_inputs() builds them in the app"""
+    return dict(FIXTURE_TEST_CONFIGS[test_type], test_type=test_type, seed=BENCHMARK_SEED, material=material,
+                material_props=reference_props(material), mass_kg=load_cases.REFERENCE_PACKAGE_MASS_KG,
+                thickness_scale=1.0, model_hash=None)
+
+
+@benchmark("fea_results", ("drop", "vibration", "live_transport", "stacking"), quick=("drop", "stacking"),
+           unit="load case")
+def bench_fea_results(test_type):
+    """evaluate_load_case (behind generate_fea_results and the job workers) on a cold graph"""
+    inputs = fixture_inputs(test_type)
+
+    def run():
+        # Clear the buckling memo so every repeat pays for the eigenvalue solve; no stage store, so nothing is reused
+        fea_utils.plate_buckling_coefficient.cache_clear()
+        load_cases.evaluate_load_case(load_cases.build_analysis_graph(store_dir=None), inputs)
+    return run
+
+
+@benchmark("stacking_buckling", (8, 16, 24, 32), unit="grid")
+def bench_stacking_buckling(grid):
+    def run():
+        fea_utils.plate_buckling_coefficient.cache_clear()
+        fea_utils.plate_buckling_coefficient(1.25, grid=grid)
+    return run
+
+
+def check_geometry_units(outer_mm=(200.0, 100.0, 50.0), wall_mm=2.0):
+    """Closed box with a 2 mm wall modelled in millimetres must analyse to the expected metre values"""
+    outer = trimesh.creation.box(extents=outer_mm)
+    inner = trimesh.creation.box(extents=[extent - 2 * wall_mm for extent in outer_mm])
+    inner.invert()
+    mesh, units = fea_utils.normalize_mesh_units(trimesh.util.concatenate([outer, inner]))
+    analysis = fea_utils.analyze_geometry(mesh, units)
+
+    expected_volume = (np.prod(outer_mm) - np.prod([extent - 2 * wall_mm for extent in outer_mm])) * 1e-9
+    problems = []
+    if units != "mm":
+        problems.append(f"units detected as {units}, expected mm")
+    if not np.isclose(analysis["volume_m3"], expected_volume, rtol=1e-6):
+        problems.append(f"volume {analysis['volume_m3']:.4g} m³, expected {expected_volume:.4g} m³")
+    median = analysis.get("thickness_m", {}).get("median", np.nan)
+    if not np.isclose(median, wall_mm * 1e-3, rtol=0.02):
+        problems.append(f"median wall {median:.4g} m, expected {wall_mm * 1e-3:.4g} m")
+    if problems:
+        raise RuntimeError("Geometry analysis check failed: " + "; ".join(problems))
+
+
+@benchmark("geometry_analysis", (3, 4, 5, 6), unit="subdivisions")
+def bench_geometry_analysis(subdivisions):
+    """Upload geometry analysis on an icosphere mesh (20 x 4^n faces), after the known-size box check"""
+    check_geometry_units()
+    mesh = trimesh.creation.icosphere(subdivisions=subdivisions, radius=0.1)
+    return lambda: fea_utils.analyze_geometry(mesh)
+
+
+def fixture_case_loads():
+    """Loads stage of every fixture load case (computed before timing, as the analysis jobs do)"""
+    graph = load_cases.build_analysis_graph(store_dir=None)
+    return {test_type: graph.evaluate("loads", fixture_inputs(test_type), scope=test_type)
+            for test_type in FIXTURE_TEST_CONFIGS}
+
+
+@benchmark("recommendation_optimizer", (8, 15, 30), unit="screen points")
+def bench_recommendation_optimizer(screen_points):
+    """optimize_material_design (behind generate_frameedge_recommendations) over the built-in grades"""
+    case_loads = fixture_case_loads()
+    library = material_library.MaterialLibrary.from_records(material_library.BUILTIN_MATERIALS)
+    return lambda: load_cases.optimize_material_design(library, "PP", case_loads, None,
+                                                       screen_points=screen_points)
+
+
+@benchmark("recommendation_ranking", (100, 1000, 10000, 100000), unit="grades")
+def bench_recommendation_ranking(grades):
+    """rank_materials (behind rank_material_library) over a synthetic library, a tenth of it corrugated"""
+    case_loads = fixture_case_loads()
+    rng = np.random.default_rng(BENCHMARK_SEED)
+    corrugated = np.arange(grades) % 10 == 0
+    library = material_library.MaterialLibrary(material_library.normalize_material_table(pd.DataFrame({
+        "key": [f"G{i}" for i in range(grades)],
+        "name": [f"Grade {i}" for i in range(grades)],
+        "density": np.where(corrugated, rng.uniform(100, 250, grades), rng.uniform(800, 1500, grades)),
+        "youngs_modulus": rng.uniform(0.5e9, 3.5e9, grades),
+        "poisson_ratio": rng.uniform(0.3, 0.45, grades),
+        "yield_strength": rng.uniform(10e6, 70e6, grades),
+        "ultimate_strength": rng.uniform(15e6, 90e6, grades),
+        "cost_per_kg": rng.uniform(0.5, 5.0, grades),
+        "corrugated": corrugated,
+    })))
+    return lambda: load_cases.rank_materials(library, case_loads, None)
+
+
+def measure(func, min_repeats=MIN_REPEATS, min_time=MIN_TIME_SECONDS):
+    """Median/min wall time over repeated calls, then peak memory and retained blocks of one traced call
+
+    `retained_blocks` counts the memory blocks still allocated after the call
+    (a leak indicator), not every allocation made during it.
+    """
+    func()   # Warm-up: imports, caches and page faults are not part of the measurement
+
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_repeats or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+
+    return {
+        "time_s": statistics.median(times),
+        "time_min_s": min(times),
+        "repeats": len(times),
+        "peak_bytes": peak,
+        "retained_blocks": retained_blocks,
+    }
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def run_benchmarks(names=None, quick=False, log=print):
+    """Run the selected benchmarks over their size sweeps; returns {"machine", "results"}"""
+    results = {}
+    for name, spec in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        results[name] = {}
+        for size in (spec["quick"] if quick else spec["sizes"]):
+            measurement = measure(spec["factory"](size))
+            results[name][str(size)] = measurement
+            log(f"{name:26s} {str(size):>16s} {spec['unit']:14s} {measurement['time_s'] * 1e3:10.2f} ms "
+                f"{measurement['peak_bytes'] / 2**20:9.2f} MiB {measurement['retained_blocks']:9d} blocks held")
+    return {"machine": machine_info(), "results": results}
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Benchmarks whose time or peak memory exceeds the baseline by more than `threshold`
+
+    Times are compared by their minimum over the repeats, the least noisy
+    estimate on a shared machine, and small absolute differences are ignored
+    so millisecond benchmarks do not flag scheduler jitter.
+    """
+    regressions = []
+    for name, sizes in current["results"].items():
+        for size, measurement in sizes.items():
+            reference = baseline.get("results", {}).get(name, {}).get(size)
+            if reference is None:
+                continue
+            for metric, min_delta in (("time_min_s", MIN_TIME_DELTA_SECONDS), ("peak_bytes", MIN_MEMORY_DELTA_BYTES)):
+                if not reference.get(metric):
+                    continue
+                if (measurement[metric] > reference[metric] * (1 + threshold)
+                        and measurement[metric] - reference[metric] > min_delta):
+                    regressions.append({
+                        "benchmark": name, "size": size, "metric": metric,
+                        "baseline": reference[metric], "current": measurement[metric],
+                        "ratio": measurement[metric] / reference[metric],
+                    })
+    return regressions
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(current, path=BASELINE_FILE):
+    """Merge the current results into the baseline file (other benchmarks keep their numbers)"""
+    baseline = load_baseline(path) or {"results": {}}
+    baseline["machine"] = current["machine"]
+    for name, sizes in current["results"].items():
+        baseline["results"].setdefault(name, {}).update(sizes)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DesignEdge.AI benchmark suite")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--quick", action="store_true", help="run the small sizes of each sweep only")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative growth flagged as a regression (default %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file (default %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and their sweeps")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, spec in BENCHMARKS.items():
+            print(f"{name:26s} {spec['unit']}: {', '.join(str(size) for size in spec['sizes'])}")
+        return 0
+
+    names = set(args.only.split(",")) if args.only else None
+    unknown = (names or set()) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    current = run_benchmarks(names, quick=args.quick)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        save_baseline(current, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        # Without a baseline nothing is checked: fail rather than pass silently
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 2
+    if baseline.get("machine", {}).get("platform") != current["machine"]["platform"]:
+        print("Warning: baseline was recorded on a different machine; timings may not be comparable")
+
+    regressions = compare(current, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['benchmark']} [{regression['size']}] {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} (x{regression['ratio']:.2f})")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
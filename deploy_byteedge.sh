@@ -4,6 +4,15 @@
 
 echo "🚀 Starting BytEdge FramEdge AI deployment..."
 
+# Deployment mode: single container (default) or scale-out with --scale
+COMPOSE_FILE=docker-compose_byteedge.yml
+APP_PORT=8501
+if [ "$1" == "--scale" ]; then
+    COMPOSE_FILE=docker-compose_byteedge_scale.yml
+    APP_PORT=8080
+    echo "⚖️  Scale-out mode: app replicas, compute workers and load balancer"
+fi
+
 # ASCII Art Header
 echo "
 ╔══════════════════════════════════════╗
@@ -21,8 +30,9 @@ if ! command -v docker &> /dev/null; then
     exit 1
 fi
 
-if ! command -v docker-compose &> /dev/null; then
-    echo "❌ Docker Compose is not installed. Please install Docker Compose first."
+# Compose v2 (the `docker compose` plugin): v1 `docker-compose` ignores deploy.replicas in the scale-out file
+if ! docker compose version &> /dev/null; then
+    echo "❌ Docker Compose v2 is not installed. Please install the Docker Compose plugin first."
     echo "📥 Download: https://docs.docker.com/compose/install/"
     exit 1
 fi
@@ -31,7 +41,7 @@ echo "✅ Prerequisites check completed"
 
 # Create directory structure
 echo "📁 Setting up directory structure..."
-mkdir -p data uploads logs models heatmaps
+mkdir -p data/models uploads logs models heatmaps
 
 # Check configuration
 if [ ! -f .env_byteedge ]; then
@@ -48,10 +58,10 @@ fi
 
 # Build and deploy
 echo "🔨 Building BytEdge FramEdge AI..."
-docker-compose -f docker-compose_byteedge.yml build --no-cache
+docker compose -f $COMPOSE_FILE build --no-cache
 
 echo "🚀 Starting BytEdge FramEdge AI..."
-docker-compose -f docker-compose_byteedge.yml up -d
+docker compose -f $COMPOSE_FILE up -d
 
 # Wait for startup
 echo "⏳ Waiting for application startup..."
@@ -59,12 +69,12 @@ sleep 15
 
 # Health check
 echo "🩺 Performing health check..."
-if curl -f http://localhost:8501/_stcore/health &> /dev/null; then
+if curl -f http://localhost:$APP_PORT/_stcore/health &> /dev/null; then
     echo "
     ✅ BytEdge FramEdge AI is running successfully!
 
     🌐 Access the application:
-       URL: http://localhost:8501
+       URL: http://localhost:$APP_PORT
 
     📊 Features Available:
        • AI-Powered Design Analysis
@@ -74,16 +84,16 @@ if curl -f http://localhost:8501/_stcore/health &> /dev/null; then
        • Advanced FEA Analysis
 
     💡 Need Help?
-       • View logs: docker-compose -f docker-compose_byteedge.yml logs -f
-       • Stop app:  docker-compose -f docker-compose_byteedge.yml down
-       • Restart:   docker-compose -f docker-compose_byteedge.yml restart
+       • View logs: docker compose -f $COMPOSE_FILE logs -f
+       • Stop app:  docker compose -f $COMPOSE_FILE down
+       • Restart:   docker compose -f $COMPOSE_FILE restart
     "
 else
     echo "❌ Application startup failed. Checking logs..."
-    docker-compose -f docker-compose_byteedge.yml logs
+    docker compose -f $COMPOSE_FILE logs
     echo "
     🔧 Troubleshooting:
-       • Check if port 8501 is available
+       • Check if port $APP_PORT is available
        • Verify .env configuration
        • Ensure GLB/image files are present
        • Check Docker resource allocation
@@ -0,0 +1,1101 @@
+# DesignEdge.AI - FEA calculation utilities
+#
+# Numerical helpers shared by the Streamlit application (final.py). Nothing in
+# this module imports Streamlit, so the functions can be reused from worker
+# processes, scripts and benchmarks.
+
+import os
+import json
+import logging
+import time
+import shutil
+import struct
+import pickle
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+import math
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import scipy.linalg
+import scipy.optimize
+import trimesh
+import meshio
+
+logger = logging.getLogger("designedge.fea")
+
+# Data directory (mounted as ./data in docker-compose_byteedge.yml)
+DATA_DIR = os.getenv("DESIGNEDGE_DATA_DIR", "data")
+
+# Upload ingestion settings
+UPLOAD_DIR = os.getenv("DESIGNEDGE_UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = 1 << 20                                             # 1 MB per read
+MAX_UPLOAD_BYTES = int(os.getenv("DESIGNEDGE_MAX_UPLOAD_MB", "200")) * (1 << 20)
+
+# CAD conversion settings
+CONVERTED_DIR = os.path.join(UPLOAD_DIR, "converted")
+CONVERSION_WORKERS = int(os.getenv("DESIGNEDGE_CONVERSION_WORKERS", "2"))
+CAD_EXTENSIONS = {".step", ".stp", ".iges", ".igs"}
+CAD_MESH_SIZE_FACTOR = 0.02   # Maximum tessellation edge length relative to the model diagonal
+
+# Geometry analysis settings
+THICKNESS_SAMPLES = 20000          # Surface samples used for the wall-thickness distribution
+THICKNESS_RAY_BATCH = 10000        # Rays cast per batch (bounds memory on huge meshes)
+THICKNESS_HISTOGRAM_BINS = 20
+DEFAULT_SHEET_THICKNESS_M = 0.001  # Assumed wall for open (non-watertight) surface models
+
+# Model units. GLB and STL files carry no trustworthy unit (CAD tools export
+# them in millimetres as often as in metres), so uploads are rescaled to
+# metres before analysis: either with the unit chosen by the user or with the
+# first unit that makes the part a plausible packaging size.
+MODEL_UNITS = {"m": 1.0, "mm": 0.001, "cm": 0.01, "in": 0.0254}   # Detection tries them in this order
+PLAUSIBLE_PART_SIZE_M = (0.005, 5.0)                             # Largest extent of a packaging part
+
+# Stacking compression settings
+GRAVITY = 9.81
+MCKEE_CONSTANT = 5.87              # McKee box compression formula constant
+# Edge crush (N/m) estimated as strength x caliper x this factor when a corrugated grade has no
+# measured ECT: only the liners and flute tips carry the short-span crush load, and the factor
+# maps the generic 12 MPa / 4 mm Cardboard grade to a typical 32 ECT single wall (~5.6 kN/m)
+ECT_ESTIMATE_FACTOR = 0.12
+PLATE_BUCKLING_GRID = 16           # Interior grid points across the panel width for the eigenvalue solve
+
+# Design optimizer settings
+OPTIMIZER_SCREEN_POINTS = 15       # Screening grid points per design variable
+OPTIMIZER_STARTS = 3               # Nelder-Mead refinements started from the best screened designs
+OPTIMIZER_PENALTY = 1e3            # Exterior penalty per unit of safety-factor shortfall (x objective scale)
+OPTIMIZER_MAX_ITERATIONS = 200
+
+# What-if surrogate settings
+SURROGATE_MAX_DEGREE = 3           # Highest polynomial degree tried by the cross-validation
+
+# Analysis stages shared between processes (app script threads and job queue workers)
+STAGE_STORE_DIR = os.path.join(DATA_DIR, "stages")
+STAGE_STORE_MAX_ENTRIES = int(os.getenv("DESIGNEDGE_MAX_STORED_STAGES", "500"))   # Per stage, least recently used deleted
+
+# Multi-resolution trace pyramid settings
+PYRAMID_ROOT = os.path.join(DATA_DIR, "trace_pyramids")
+PYRAMID_FANOUT = 4          # Samples merged per bin from one level to the next
+PYRAMID_MIN_BINS = 256      # Stop aggregating once a level is this small
+PYRAMID_MAX_ENTRIES = int(os.getenv("DESIGNEDGE_MAX_PYRAMIDS", "200"))   # Least recently used pyramids beyond this are deleted
+PYRAMID_STALE_SECONDS = 3600  # Unfinished pyramid directories older than this are left-overs of crashed writers
+
+# Drop impact zones: direction towards the impacted feature in bounding-box
+# coordinates (y up), peak stress relative to the load case maximum, and the
+# decay length of the stress concentration relative to the box diagonal
+DROP_IMPACT_ZONES = {
+    "Corner": ((-1, -1, -1), 1.00, 0.18),
+    "Edge": ((-1, -1, 0), 0.85, 0.25),
+    "Face-Front": ((0, 0, 1), 0.60, 0.35),
+    "Face-Back": ((0, 0, -1), 0.60, 0.35),
+    "Face-Side": ((1, 0, 0), 0.65, 0.35),
+    "Face-Top": ((0, 1, 0), 0.55, 0.40),
+}
+MEMBRANE_STRESS_FRACTION = 0.12   # Far-field stress away from the impact zone
+
+# Level-of-detail models served to the 3D viewer (see asset_server.py)
+MODEL_ROOT = os.path.join(os.getenv("DESIGNEDGE_ASSET_DIR", "static"), "models")
+LOD_FACE_TARGETS = (2000, 20000, 200000)   # Coarse to fine; the full mesh is always the last level
+
+
+def file_sha256(path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ingest_upload(fileobj, filename, upload_dir=UPLOAD_DIR, max_bytes=MAX_UPLOAD_BYTES,
+                  chunk_size=UPLOAD_CHUNK_SIZE):
+    """Stream an uploaded file to disk in chunks, hashing it on the way
+
+    The file is written to a temporary file while its SHA-256 digest is
+    computed, then moved to `<upload_dir>/<sha256><ext>`. Identical uploads are
+    deduplicated by that name. Raises ValueError when max_bytes is exceeded.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    extension = os.path.splitext(filename)[1].lower()
+    digest = hashlib.sha256()
+    size = 0
+
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"{filename} exceeds the {max_bytes / (1 << 20):.0f} MB upload limit")
+                digest.update(chunk)
+                out.write(chunk)
+
+        file_hash = digest.hexdigest()
+        path = os.path.join(upload_dir, f"{file_hash}{extension}")
+        duplicate = os.path.isfile(path)
+        if duplicate:
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {"hash": file_hash, "path": path, "size": size, "duplicate": duplicate}
+
+
+def _reduce_level(mins, maxs, sums, counts, fanout):
+    """Merge consecutive groups of `fanout` bins into one min/max/sum/count bin"""
+    starts = np.arange(0, len(counts), fanout)
+    return (
+        np.minimum.reduceat(mins, starts, axis=-1),
+        np.maximum.reduceat(maxs, starts, axis=-1),
+        np.add.reduceat(sums, starts, axis=-1),
+        np.add.reduceat(counts, starts),
+    )
+
+
+def trace_fingerprint(distance_points, channels, fanout=PYRAMID_FANOUT, min_bins=PYRAMID_MIN_BINS):
+    """Content hash of a transport trace and pyramid layout, used as its storage key"""
+    digest = hashlib.sha256(json.dumps([sorted(channels), fanout, min_bins]).encode("utf-8"))
+    digest.update(np.ascontiguousarray(distance_points, dtype=np.float64).tobytes())
+    for name in sorted(channels):
+        digest.update(np.ascontiguousarray(channels[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def build_trace_pyramid(distance_points, channels, key=None, root=PYRAMID_ROOT,
+                        fanout=PYRAMID_FANOUT, min_bins=PYRAMID_MIN_BINS, max_entries=PYRAMID_MAX_ENTRIES):
+    """Pre-aggregate a transport trace into an on-disk min/max/mean pyramid
+
+    Level 0 holds the raw samples; every following level merges `fanout` bins
+    of the previous one. Each level is written as .npy files so that queries
+    can memory-map only the slice they need. Pyramids are keyed by the trace
+    content, so rerunning the same trace reuses the stored files, and only
+    the `max_entries` most recently used pyramids are kept.
+    """
+    key = key or trace_fingerprint(distance_points, channels, fanout, min_bins)
+    meta = load_pyramid_meta(key, root)
+    if meta is not None:
+        # Mark as recently used for the pruning below
+        os.utime(os.path.join(root, key, "meta.json"))
+        return meta
+
+    # Write into a private directory and publish it with one rename, so that
+    # readers and concurrent writers of the same trace never see partial files
+    os.makedirs(root, exist_ok=True)
+    directory = tempfile.mkdtemp(dir=root, prefix=f".{key}-")
+
+    names = list(channels.keys())
+    distance = np.asarray(distance_points, dtype=np.float64)
+    values = np.vstack([np.asarray(channels[name], dtype=np.float64) for name in names])
+
+    mins, maxs, sums = values, values, values
+    dist_sums = distance
+    counts = np.ones(len(distance), dtype=np.int64)
+
+    levels = []
+    level = 0
+    while True:
+        means = sums / counts
+        np.save(os.path.join(directory, f"L{level}_distance.npy"), dist_sums / counts)
+        np.save(os.path.join(directory, f"L{level}_count.npy"), counts)
+        for row, name in enumerate(names):
+            stats = np.stack([mins[row], maxs[row], means[row]], axis=1).astype(np.float32)
+            np.save(os.path.join(directory, f"L{level}_{name}.npy"), stats)
+
+        levels.append({"level": level, "bins": int(len(counts)), "factor": int(fanout ** level)})
+
+        if len(counts) <= min_bins:
+            break
+
+        mins, maxs, sums, new_counts = _reduce_level(mins, maxs, sums, counts, fanout)
+        dist_sums = np.add.reduceat(dist_sums, np.arange(0, len(counts), fanout))
+        counts = new_counts
+        level += 1
+
+    meta = {
+        "key": key,
+        "channels": names,
+        "fanout": fanout,
+        "samples": int(len(distance)),
+        "distance_range": [float(distance[0]), float(distance[-1])] if len(distance) else [0.0, 0.0],
+        "levels": levels,
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    try:
+        os.rename(directory, os.path.join(root, key))
+    except OSError:
+        # Another process stored the same trace first
+        shutil.rmtree(directory, ignore_errors=True)
+
+    prune_trace_pyramids(root, max_entries)
+    return meta
+
+
+def prune_trace_pyramids(root=PYRAMID_ROOT, max_entries=PYRAMID_MAX_ENTRIES):
+    """Delete the least recently used pyramids beyond max_entries and stale unfinished ones"""
+    stored, now = [], time.time()
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        try:
+            if entry.name.startswith("."):
+                if now - entry.stat().st_mtime > PYRAMID_STALE_SECONDS:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                stored.append((os.stat(os.path.join(entry.path, "meta.json")).st_mtime, entry.path))
+        except OSError:
+            continue
+
+    stored.sort(reverse=True)
+    for _, path in stored[max_entries:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_pyramid_meta(key, root=PYRAMID_ROOT):
+    """Read the metadata of a stored trace pyramid, or None if it is missing"""
+    try:
+        with open(os.path.join(root, key, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def query_trace_pyramid(key, start_km=None, end_km=None, max_points=2000, root=PYRAMID_ROOT):
+    """Return the finest pyramid level covering [start_km, end_km] within max_points
+
+    The result holds bin-centre distances plus min/max/mean arrays per channel.
+    Only the requested window is read from the memory-mapped level files.
+    Returns None when the pyramid is missing or was pruned.
+    """
+    meta = load_pyramid_meta(key, root)
+    if meta is None:
+        return None
+
+    try:
+        return _query_levels(meta, os.path.join(root, key), start_km, end_km, max_points)
+    except OSError:
+        return None
+
+
+def _query_levels(meta, directory, start_km, end_km, max_points):
+    start_km = meta["distance_range"][0] if start_km is None else start_km
+    end_km = meta["distance_range"][1] if end_km is None else end_km
+
+    for level_info in meta["levels"]:
+        level = level_info["level"]
+        distance = np.load(os.path.join(directory, f"L{level}_distance.npy"), mmap_mode="r")
+        lo = max(int(np.searchsorted(distance, start_km, side="left")) - 1, 0)
+        hi = min(int(np.searchsorted(distance, end_km, side="right")) + 1, len(distance))
+
+        if hi - lo <= max_points or level_info is meta["levels"][-1]:
+            window = {"level": level, "factor": level_info["factor"],
+                      "distance": np.array(distance[lo:hi])}
+            for name in meta["channels"]:
+                stats = np.load(os.path.join(directory, f"L{level}_{name}.npy"), mmap_mode="r")[lo:hi]
+                window[name] = {
+                    "min": np.array(stats[:, 0]),
+                    "max": np.array(stats[:, 1]),
+                    "mean": np.array(stats[:, 2]),
+                }
+            return window
+
+    return None
+
+
+# glTF constants used by the quantized GLB writer
+GLTF_BYTE = 5120
+GLTF_SHORT = 5122
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_UNSIGNED_INT = 5125
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+
+def load_mesh(path, file_type=None):
+    """Load a model file as a single triangle mesh (scenes are concatenated)"""
+    mesh = trimesh.load(path, file_type=file_type, force="mesh")
+    if not isinstance(mesh, trimesh.Trimesh) or len(mesh.faces) == 0:
+        raise ValueError(f"No triangle geometry found in {os.path.basename(path)}")
+    return mesh
+
+
+def detect_model_units(mesh):
+    """First unit of MODEL_UNITS that makes the largest extent a plausible part size (m if none does)"""
+    largest = float(np.max(mesh.extents))
+    lower, upper = PLAUSIBLE_PART_SIZE_M
+    for units, scale in MODEL_UNITS.items():
+        if lower <= largest * scale <= upper:
+            return units
+    return "m"
+
+
+def normalize_mesh_units(mesh, units="auto"):
+    """Copy of a mesh rescaled to metres, and the source unit ("auto" detects it)"""
+    if units == "auto":
+        units = detect_model_units(mesh)
+    scale = MODEL_UNITS[units]
+    if scale != 1.0:
+        mesh = mesh.copy()
+        mesh.apply_scale(scale)
+    return mesh, units
+
+
+def model_key(file_hash, units="auto"):
+    """Storage key of a converted model: content hash plus the unit choice it was converted with"""
+    return f"{file_hash}-{units}"
+
+
+def write_quantized_glb(vertices, faces, normals, path):
+    """Write a mesh as GLB with KHR_mesh_quantization vertex buffers
+
+    Positions are stored as int16 relative to the bounding box centre (the
+    node scale/translation restores model units), normals as normalized int8
+    and indices as uint16 whenever the vertex count allows it. The node scale
+    is uniform (largest extent), since a per-axis scale would also apply to
+    the normals and tilt them off the surface.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+    normals = np.asarray(normals, dtype=np.float64)
+
+    lower, upper = vertices.min(axis=0), vertices.max(axis=0)
+    center = (lower + upper) / 2.0
+    scale = max(float(np.max(upper - lower)) / 2.0, 1e-12) / 32767.0
+
+    # int16 VEC3 padded to 8-byte stride, int8 VEC3 padded to 4-byte stride (glTF alignment rules)
+    positions = np.zeros((len(vertices), 4), dtype=np.int16)
+    positions[:, :3] = np.round((vertices - center) / scale).clip(-32767, 32767)
+    packed_normals = np.zeros((len(normals), 4), dtype=np.int8)
+    packed_normals[:, :3] = np.round(normals * 127.0).clip(-127, 127)
+
+    if len(vertices) < 65536:
+        indices, index_type = faces.astype(np.uint16).ravel(), GLTF_UNSIGNED_SHORT
+    else:
+        indices, index_type = faces.astype(np.uint32).ravel(), GLTF_UNSIGNED_INT
+
+    blobs = [positions.tobytes(), packed_normals.tobytes(), indices.tobytes()]
+    offsets, total = [], 0
+    for blob in blobs:
+        offsets.append(total)
+        total += (len(blob) + 3) & ~3
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "DesignEdge.AI"},
+        "extensionsUsed": ["KHR_mesh_quantization"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": center.tolist(), "scale": [scale] * 3}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2}]}],
+        "buffers": [{"byteLength": total}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": offsets[0], "byteLength": len(blobs[0]), "byteStride": 8, "target": GLTF_ARRAY_BUFFER},
+            {"buffer": 0, "byteOffset": offsets[1], "byteLength": len(blobs[1]), "byteStride": 4, "target": GLTF_ARRAY_BUFFER},
+            {"buffer": 0, "byteOffset": offsets[2], "byteLength": len(blobs[2]), "target": GLTF_ELEMENT_ARRAY_BUFFER},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": GLTF_SHORT, "count": len(vertices), "type": "VEC3",
+             "min": positions[:, :3].min(axis=0).tolist(), "max": positions[:, :3].max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": GLTF_BYTE, "normalized": True, "count": len(normals), "type": "VEC3"},
+            {"bufferView": 2, "componentType": index_type, "count": len(indices), "type": "SCALAR"},
+        ],
+    }
+
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_chunk = b"".join(blob + b"\x00" * (-len(blob) % 4) for blob in blobs)
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)))
+        f.write(struct.pack("<I4s", len(json_chunk), b"JSON"))
+        f.write(json_chunk)
+        f.write(struct.pack("<I4s", len(bin_chunk), b"BIN\x00"))
+        f.write(bin_chunk)
+
+
+def load_model_meta(key, root=MODEL_ROOT):
+    """Read the LOD metadata of a fully converted model, or None if it is missing"""
+    directory = os.path.join(root, key)
+    if not os.path.isfile(os.path.join(directory, "lod0_vertices.npy")):
+        return None
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def lods_complete(meta):
+    """Whether stored LOD metadata can be reused (it exists and decimation did not fail)"""
+    return meta is not None and not meta.get("decimation_error")
+
+
+def build_model_lods(mesh, key, root=MODEL_ROOT, face_targets=LOD_FACE_TARGETS):
+    """Simplify a mesh into coarse-to-fine LOD levels stored as quantized GLB files
+
+    Results are cached on disk under `key` (the upload content hash), so a
+    model is only decimated once. Levels stored after a decimation failure
+    are rebuilt, so installing the backend later takes effect.
+    """
+    meta = load_model_meta(key, root)
+    if lods_complete(meta):
+        return meta
+
+    directory = os.path.join(root, key)
+    meta_path = os.path.join(directory, "meta.json")
+    os.makedirs(directory, exist_ok=True)
+
+    levels = []
+    decimation_error = None
+    for target in sorted(face_targets):
+        if target >= len(mesh.faces):
+            break
+        try:
+            levels.append(mesh.simplify_quadric_decimation(face_count=target))
+        except ImportError as e:
+            # No decimation backend (fast-simplification): every level would fail the same way
+            decimation_error = f"mesh decimation backend unavailable ({e})"
+            logger.warning("LOD generation for %s skipped: %s", key, decimation_error)
+            break
+        except Exception as e:
+            decimation_error = f"decimation to {target} faces failed ({e})"
+            logger.warning("LOD generation for %s: %s", key, decimation_error)
+    levels.append(mesh)
+
+    lods = []
+    for index, level_mesh in enumerate(levels):
+        filename = f"lod{index}.glb"
+        write_quantized_glb(level_mesh.vertices, level_mesh.faces, level_mesh.vertex_normals,
+                            os.path.join(directory, filename))
+        # Vertex positions in GLB order, used to evaluate per-vertex result fields
+        np.save(os.path.join(directory, f"lod{index}_vertices.npy"), np.asarray(level_mesh.vertices, dtype=np.float32))
+        lods.append({"file": filename, "faces": int(len(level_mesh.faces)),
+                     "vertices": int(len(level_mesh.vertices))})
+
+    meta = {"key": key, "lods": lods, "bounds": mesh.bounds.tolist(), "decimation_error": decimation_error}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    return meta
+
+
+def drop_stress_field(vertices, bounds, max_stress, orientation):
+    """Nodal von Mises stress (MPa) for a drop onto the given corner, edge or face
+
+    The impacted feature is located on the model bounding box. The distance of
+    each vertex to it is measured only along the axes that define the feature
+    (point for a corner, line for an edge, plane for a face) and the stress
+    concentration decays exponentially with that distance.
+    """
+    direction, peak_factor, decay = DROP_IMPACT_ZONES[orientation]
+    direction = np.asarray(direction, dtype=np.float64)
+    lower, upper = np.asarray(bounds[0], dtype=np.float64), np.asarray(bounds[1], dtype=np.float64)
+    center, half_extent = (lower + upper) / 2.0, (upper - lower) / 2.0
+    diagonal = max(float(np.linalg.norm(upper - lower)), 1e-12)
+
+    impact_point = center + half_extent * direction
+    offsets = (np.asarray(vertices, dtype=np.float64) - impact_point) * (direction != 0)
+    distance = np.sqrt(np.einsum("ij,ij->i", offsets, offsets)) / diagonal
+
+    concentration = np.exp(-distance / decay)
+    return max_stress * peak_factor * (MEMBRANE_STRESS_FRACTION + (1.0 - MEMBRANE_STRESS_FRACTION) * concentration)
+
+
+def pack_stress_attribute(stress, vmax):
+    """Quantize a nodal stress field to uint8 colormap indices over [0, vmax]"""
+    scaled = np.asarray(stress, dtype=np.float64) / max(vmax, 1e-12) * 255.0
+    return np.round(scaled).clip(0, 255).astype(np.uint8)
+
+
+def build_stress_overlay(model_meta, load_case, max_stress, orientations, root=MODEL_ROOT):
+    """Write per-LOD uint8 stress attribute buffers for every drop orientation
+
+    Only these small buffers (one byte per vertex) change between load cases;
+    the LOD meshes themselves are shared. Returns the relative file names per
+    orientation, ordered like the LOD levels.
+    """
+    directory = os.path.join(root, model_meta["key"])
+    overlay_dir = os.path.join(directory, "stress", load_case)
+    os.makedirs(overlay_dir, exist_ok=True)
+
+    files = {}
+    for orientation in orientations:
+        files[orientation] = []
+        for index in range(len(model_meta["lods"])):
+            filename = f"{orientation.lower()}_lod{index}.bin"
+            path = os.path.join(overlay_dir, filename)
+            if not os.path.isfile(path):
+                vertices = np.load(os.path.join(directory, f"lod{index}_vertices.npy"), mmap_mode="r")
+                stress = drop_stress_field(vertices, model_meta["bounds"], max_stress, orientation)
+                pack_stress_attribute(stress, max_stress).tofile(path)
+            files[orientation].append(f"models/{model_meta['key']}/stress/{load_case}/{filename}")
+
+    return {"vmax": float(max_stress), "files": files}
+
+
+def wall_thickness_samples(mesh, samples=THICKNESS_SAMPLES, batch=THICKNESS_RAY_BATCH, seed=0):
+    """Wall thickness at area-weighted surface samples by casting rays inward
+
+    Each sample casts one ray against the inward face normal; the distance to
+    the first hit is the local wall thickness (NaN where the ray escapes, e.g.
+    on open surfaces). Rays are cast in batches; trimesh uses Embree when
+    embreex is installed.
+    """
+    points, face_index = trimesh.sample.sample_surface(mesh, samples, seed=seed)
+    directions = -mesh.face_normals[face_index]
+    epsilon = 1e-6 * max(float(mesh.scale), 1e-12)
+    origins = points + directions * epsilon
+
+    thickness = np.full(len(points), np.nan)
+    for start in range(0, len(points), batch):
+        stop = min(start + batch, len(points))
+        locations, index_ray, _ = mesh.ray.intersects_location(
+            origins[start:stop], directions[start:stop], multiple_hits=False)
+        if len(index_ray):
+            thickness[start + index_ray] = np.linalg.norm(locations - origins[start + index_ray], axis=1) + epsilon
+    return thickness
+
+
+def analyze_geometry(mesh, source_units="m"):
+    """Volume, surface area, bounding box, watertightness and wall-thickness statistics
+
+    The mesh must already be in metres (see normalize_mesh_units); the unit
+    it was converted from is recorded as source_units.
+    """
+    thickness = wall_thickness_samples(mesh)
+    hits = thickness[np.isfinite(thickness)]
+    watertight = bool(mesh.is_watertight)
+    area = float(mesh.area)
+
+    if watertight:
+        volume, volume_source = abs(float(mesh.volume)), "closed solid"
+    else:
+        volume, volume_source = area * DEFAULT_SHEET_THICKNESS_M, "surface area x assumed sheet thickness"
+
+    analysis = {
+        "source_units": source_units,
+        "triangles": int(len(mesh.faces)),
+        "vertices": int(len(mesh.vertices)),
+        "bounds": mesh.bounds.tolist(),
+        "extents": mesh.extents.tolist(),
+        "surface_area_m2": area,
+        "volume_m3": volume,
+        "volume_source": volume_source,
+        "watertight": watertight,
+        "thickness_samples": int(len(thickness)),
+        "thickness_hits": int(len(hits)),
+    }
+
+    if len(hits):
+        counts, edges = np.histogram(hits, bins=THICKNESS_HISTOGRAM_BINS)
+        analysis["thickness_m"] = {
+            "min": float(hits.min()),
+            "p5": float(np.percentile(hits, 5)),
+            "median": float(np.median(hits)),
+            "p95": float(np.percentile(hits, 95)),
+            "max": float(hits.max()),
+            "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+        }
+
+    return analysis
+
+
+def analyze_model(mesh, key, source_units="m", root=MODEL_ROOT):
+    """Geometry analysis of a mesh in metres, cached next to the model LODs (see model_key)"""
+    analysis = load_model_analysis(key, root)
+    if analysis is None:
+        analysis = analyze_geometry(mesh, source_units)
+        directory = os.path.join(root, key)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "analysis.json"), "w") as f:
+            json.dump(analysis, f)
+    return analysis
+
+
+def load_model_analysis(key, root=MODEL_ROOT):
+    """Stored geometry analysis of a model, or None"""
+    try:
+        with open(os.path.join(root, key, "analysis.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_progress(key, stage, fraction, root=CONVERTED_DIR):
+    """Record conversion progress for the job status poller"""
+    os.makedirs(root, exist_ok=True)
+    temp_path = os.path.join(root, f"{key}.progress.tmp")
+    with open(temp_path, "w") as f:
+        json.dump({"stage": stage, "progress": fraction}, f)
+    os.replace(temp_path, os.path.join(root, f"{key}.progress.json"))
+
+
+def _read_progress(key, root=CONVERTED_DIR):
+    """Last progress recorded by a conversion worker, or None"""
+    try:
+        with open(os.path.join(root, f"{key}.progress.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def tessellate_cad(src_path, key, units="auto", out_dir=CONVERTED_DIR, mesh_size_factor=CAD_MESH_SIZE_FACTOR):
+    """Tessellate a STEP/IGES file into a triangle mesh in metres and store it as GLB and VTU
+
+    Uses the OpenCASCADE kernel bundled with gmsh, which converts the CAD
+    units to metres itself; STEP files fall back to trimesh's own STEP loader
+    when gmsh is not installed, and its output is rescaled with `units`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    glb_path = os.path.join(out_dir, f"{key}.glb")
+    if os.path.isfile(glb_path):
+        return glb_path
+
+    try:
+        import gmsh
+    except ImportError:
+        gmsh = None
+
+    if gmsh is None:
+        if os.path.splitext(src_path)[1].lower() not in (".step", ".stp"):
+            raise RuntimeError("IGES conversion requires the gmsh package")
+        mesh, _ = normalize_mesh_units(load_mesh(src_path), units)
+    else:
+        gmsh.initialize()
+        try:
+            gmsh.option.setNumber("General.Terminal", 0)
+            gmsh.option.setString("Geometry.OCCTargetUnit", "M")
+            gmsh.model.add(key)
+            _write_progress(key, "Importing CAD geometry", 0.1, out_dir)
+            gmsh.model.occ.importShapes(src_path)
+            gmsh.model.occ.synchronize()
+
+            xmin, ymin, zmin, xmax, ymax, zmax = gmsh.model.getBoundingBox(-1, -1)
+            diagonal = math.sqrt((xmax - xmin) ** 2 + (ymax - ymin) ** 2 + (zmax - zmin) ** 2)
+            gmsh.option.setNumber("Mesh.MeshSizeMax", max(diagonal * mesh_size_factor, 1e-6))
+
+            _write_progress(key, "Tessellating surfaces", 0.3, out_dir)
+            gmsh.model.mesh.generate(2)
+
+            node_tags, coords, _ = gmsh.model.mesh.getNodes()
+            element_types, _, element_nodes = gmsh.model.mesh.getElements(dim=2)
+        finally:
+            gmsh.finalize()
+
+        triangles = [nodes for element_type, nodes in zip(element_types, element_nodes) if element_type == 2]
+        if not triangles:
+            raise ValueError(f"No surfaces could be tessellated in {os.path.basename(src_path)}")
+
+        # Map gmsh node tags (not necessarily contiguous) to vertex indices
+        order = np.argsort(node_tags)
+        faces = order[np.searchsorted(node_tags, np.concatenate(triangles), sorter=order)].reshape(-1, 3)
+        mesh = trimesh.Trimesh(vertices=np.asarray(coords).reshape(-1, 3), faces=faces, process=True)
+
+    _write_progress(key, "Writing tessellated mesh", 0.6, out_dir)
+    mesh.export(glb_path, file_type="glb")
+    meshio.write_points_cells(os.path.join(out_dir, f"{key}.vtu"), mesh.vertices, [("triangle", mesh.faces)])
+    return glb_path
+
+
+def load_model_in_metres(src_path, key, units="auto"):
+    """Mesh of a model file in metres and the unit it was converted from (CAD is tessellated first)"""
+    extension = os.path.splitext(src_path)[1].lower()
+    if extension in CAD_EXTENSIONS:
+        # STEP/IGES declare their unit; the tessellated GLB is already in metres
+        return load_mesh(tessellate_cad(src_path, key, units)), "cad" if units == "auto" else units
+
+    _write_progress(key, "Reading mesh", 0.3)
+    return normalize_mesh_units(load_mesh(src_path, file_type=extension.lstrip(".")), units)
+
+
+def prepare_model_job(src_path, key, units="auto"):
+    """Worker entry point: load the model in metres, analyse it and build the viewer LODs"""
+    _write_progress(key, "Starting conversion", 0.05)
+    mesh, source_units = load_model_in_metres(src_path, key, units)
+
+    _write_progress(key, "Analyzing geometry", 0.7)
+    analyze_model(mesh, key, source_units)
+
+    _write_progress(key, "Building preview levels", 0.8)
+    meta = build_model_lods(mesh, key)
+    _write_progress(key, "Completed", 1.0)
+    return meta
+
+
+class ConversionService:
+    """Process pool running model conversions off the Streamlit script thread
+
+    Jobs are keyed by upload content hash: finished conversions are served
+    from disk and a job already in flight is shared by every session asking
+    for the same file.
+    """
+
+    def __init__(self, workers=CONVERSION_WORKERS):
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, src_path, key, units="auto", retry=False):
+        """Queue a conversion unless it is cached, running or failed (unless retry); returns its status"""
+        with self._lock:
+            if not lods_complete(load_model_meta(key)):
+                future = self._jobs.get(key)
+                if future is None or (retry and future.done() and future.exception() is not None):
+                    self._jobs[key] = self._executor.submit(prepare_model_job, src_path, key, units)
+        return self.status(key)
+
+    def status(self, key):
+        """Current state of a conversion: queued, running, done or failed"""
+        meta = load_model_meta(key)
+        if lods_complete(meta):
+            return {"status": "done", "stage": "Completed", "progress": 1.0, "meta": meta}
+
+        future = self._jobs.get(key)
+        if future is None:
+            if meta is not None:
+                # Levels of an earlier conversion whose decimation failed
+                return {"status": "done", "stage": "Completed", "progress": 1.0, "meta": meta}
+            return {"status": "unknown", "stage": "Not submitted", "progress": 0.0}
+
+        if future.done():
+            error = future.exception()
+            if error is not None:
+                return {"status": "failed", "stage": "Failed", "progress": 1.0, "error": str(error)}
+            return {"status": "done", "stage": "Completed", "progress": 1.0, "meta": future.result()}
+
+        progress = _read_progress(key)
+        if progress is None:
+            return {"status": "queued", "stage": "Waiting for a conversion worker", "progress": 0.0}
+        return {"status": "running", "stage": progress["stage"], "progress": progress["progress"]}
+
+
+@functools.lru_cache(maxsize=512)
+def plate_buckling_coefficient(aspect_ratio, grid=PLATE_BUCKLING_GRID):
+    """Buckling coefficient k = N_cr b^2 / D of a simply supported panel in uniaxial compression
+
+    Solves the linear eigenvalue problem D lap^2 w = -N d2w/dy2 by finite
+    differences on a panel of unit width and height `aspect_ratio` (load
+    along the height). Simply supported edges make the biharmonic operator
+    the square of the Dirichlet Laplacian.
+    """
+    nx = grid
+    ny = int(min(max(grid, round(grid * aspect_ratio)), 4 * grid))
+    hx = 1.0 / (nx + 1)
+    hy = aspect_ratio / (ny + 1)
+
+    def second_difference(n, h):
+        return (np.diag(np.full(n, -2.0)) + np.diag(np.ones(n - 1), 1) + np.diag(np.ones(n - 1), -1)) / h**2
+
+    dxx = np.kron(np.eye(ny), second_difference(nx, hx))
+    dyy = np.kron(second_difference(ny, hy), np.eye(nx))
+    laplacian = dxx + dyy
+
+    eigenvalues = scipy.linalg.eigh(laplacian @ laplacian, -dyy, eigvals_only=True, subset_by_index=[0, 0])
+    return float(eigenvalues[0])
+
+
+def box_compression_strength(length, width, height, thickness, youngs_modulus, poisson_ratio,
+                             yield_strength, corrugated=False, edge_crush=None):
+    """Top-to-bottom compression capacity (N) of a box, vectorized over any number of SKUs
+
+    Corrugated board uses the McKee formula BCT = 5.87 ECT sqrt(t Z) with the
+    grade's measured edge crush resistance (N/m); grades without one (NaN or
+    None) fall back to strength x caliper x ECT_ESTIMATE_FACTOR. Plastic
+    boxes take the lower of the wall panel buckling load (linear eigenvalue
+    solve per unique panel aspect ratio) and the squash load of the walls.
+    All inputs are SI and broadcast against each other (scalar box dimensions
+    with per-grade material arrays give one capacity per grade).
+    """
+    length, width, height, thickness, youngs_modulus, poisson_ratio, yield_strength = np.broadcast_arrays(
+        *[np.asarray(value, dtype=np.float64)
+          for value in (length, width, height, thickness, youngs_modulus, poisson_ratio, yield_strength)])
+    perimeter = 2.0 * (length + width)
+    squash = yield_strength * thickness * perimeter
+
+    if corrugated:
+        measured = np.asarray(np.nan if edge_crush is None else edge_crush, dtype=np.float64)
+        edge_crush = np.where(np.isfinite(measured), measured, yield_strength * thickness * ECT_ESTIMATE_FACTOR)
+        capacity = MCKEE_CONSTANT * edge_crush * np.sqrt(thickness * perimeter)
+        return {"capacity_n": capacity, "mode": np.full(capacity.shape, "McKee BCT", dtype=object)}
+
+    rigidity = youngs_modulus * thickness**3 / (12.0 * (1.0 - poisson_ratio**2))
+    buckling = np.zeros_like(perimeter)
+    for panel_width in (length, width):
+        aspect = np.round(height / np.maximum(panel_width, 1e-9), 2).clip(0.1, 20.0)
+        unique_aspects, inverse = np.unique(aspect, return_inverse=True)
+        coefficients = np.array([plate_buckling_coefficient(float(a)) for a in unique_aspects])[inverse.reshape(aspect.shape)]
+        # Two opposite walls of this width, each carrying N_cr over its width
+        buckling += 2.0 * coefficients * rigidity / np.maximum(panel_width, 1e-9)
+
+    capacity = np.minimum(buckling, squash)
+    mode = np.where(buckling < squash, "Panel buckling", "Wall yielding").astype(object)
+    return {"capacity_n": capacity, "mode": mode}
+
+
+def edge_crush_is_estimated(props):
+    """True when a corrugated grade has no measured edge crush resistance"""
+    edge_crush = props.get("edge_crush")
+    return bool(props.get("corrugated", False)) and (edge_crush is None or not np.isfinite(edge_crush))
+
+
+def stacking_safety_factors(capacity_n, box_weight_kg, boxes_above, environment_factor=1.0):
+    """Safety factor of the bottom box for each stack height (vectorized over boxes_above)"""
+    load = np.asarray(boxes_above, dtype=np.float64) * box_weight_kg * GRAVITY
+    with np.errstate(divide="ignore"):
+        return np.where(load > 0, capacity_n * environment_factor / np.maximum(load, 1e-12), np.inf)
+
+
+def max_stack_height(capacity_n, box_weight_kg, environment_factor=1.0, required_safety_factor=2.0):
+    """Largest number of boxes that can be stacked on top at the required safety factor"""
+    allowable = np.asarray(capacity_n, dtype=np.float64) * environment_factor / required_safety_factor
+    return np.floor(allowable / (np.asarray(box_weight_kg, dtype=np.float64) * GRAVITY)).astype(int)
+
+
+def _fingerprint(values):
+    """Stable hash of stage inputs (JSON with sorted keys, repr for anything else)"""
+    payload = json.dumps(values, sort_keys=True, default=repr)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisGraph:
+    """Dependency-tracked analysis pipeline that recomputes only invalidated stages
+
+    Each stage declares the input keys it reads and the stages it depends on.
+    A stage is re-run only when its own inputs or the fingerprint of an
+    upstream stage changed; otherwise its cached value is reused. Separate
+    scopes (e.g. one per load case) keep independent cache slots.
+
+    Stages registered with `persist` are also stored under `store_dir` by
+    fingerprint, so every process sharing the directory (app replicas and
+    job queue workers) reuses them. `persist` is a bool or a predicate on the
+    inputs, for stages that are only reproducible for some inputs. `version`
+    (a value, or a function of the inputs) is folded into the fingerprint,
+    for what a stage depends on beyond its inputs: code versions and the
+    contents of files its inputs only name.
+    """
+
+    def __init__(self, store_dir=None, max_stored=STAGE_STORE_MAX_ENTRIES):
+        self._stages = {}
+        self._cache = {}
+        self.store_dir = store_dir
+        self.max_stored = max_stored
+        self.last_run = {"computed": [], "reused": []}
+
+    def add_stage(self, name, func, inputs=(), deps=(), persist=False, version=None):
+        """Register a stage computed as func(inputs, **upstream_values)"""
+        self._stages[name] = {"func": func, "inputs": tuple(inputs), "deps": tuple(deps), "persist": persist,
+                              "version": version}
+
+    def evaluate(self, name, inputs, scope=""):
+        """Value of a stage, recomputing it and its ancestors only where inputs changed"""
+        self.last_run = {"computed": [], "reused": []}
+        return self._evaluate(name, inputs, scope)[1]
+
+    def _evaluate(self, name, inputs, scope):
+        stage = self._stages[name]
+        upstream = {dep: self._evaluate(dep, inputs, scope) for dep in stage["deps"]}
+        fingerprint = _fingerprint({
+            "inputs": {key: inputs.get(key) for key in stage["inputs"]},
+            "deps": {dep: value[0] for dep, value in upstream.items()},
+            "version": stage["version"](inputs) if callable(stage["version"]) else stage["version"],
+        })
+
+        cached = self._cache.get((scope, name))
+        if cached is not None and cached[0] == fingerprint:
+            if name not in self.last_run["reused"] and name not in self.last_run["computed"]:
+                self.last_run["reused"].append(name)
+            return cached
+
+        persist = stage["persist"](inputs) if callable(stage["persist"]) else stage["persist"]
+        stored = self._load_stored(name, fingerprint) if persist else None
+        if stored is not None:
+            self._cache[(scope, name)] = (fingerprint, stored[0])
+            if name not in self.last_run["reused"] and name not in self.last_run["computed"]:
+                self.last_run["reused"].append(name)
+            return fingerprint, stored[0]
+
+        value = stage["func"](inputs, **{dep: value[1] for dep, value in upstream.items()})
+        self._cache[(scope, name)] = (fingerprint, value)
+        self.last_run["computed"].append(name)
+        if persist:
+            self._store(name, fingerprint, value)
+        return fingerprint, value
+
+    def _load_stored(self, name, fingerprint):
+        """(value,) of a stage stored by any process, or None"""
+        if self.store_dir is None:
+            return None
+        path = os.path.join(self.store_dir, name, f"{fingerprint}.pkl")
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)   # Recently used, for the pruning in _store
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return (value,)
+
+    def _store(self, name, fingerprint, value):
+        """Write a stage value for other processes (atomically) and prune the least recently used"""
+        if self.store_dir is None:
+            return
+        directory = os.path.join(self.store_dir, name)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, os.path.join(directory, f"{fingerprint}.pkl"))
+
+            stored = sorted((entry.stat().st_mtime, entry.path) for entry in os.scandir(directory)
+                            if entry.name.endswith(".pkl"))
+            for _, path in stored[:max(len(stored) - self.max_stored, 0)]:
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Could not store analysis stage %s: %s", name, e)
+
+    def invalidate(self, scope=None):
+        """Drop cached stage values (all scopes when scope is None)"""
+        if scope is None:
+            self._cache.clear()
+        else:
+            self._cache = {key: value for key, value in self._cache.items() if key[0] != scope}
+
+
+def optimize_design(evaluate, bounds, min_safety=2.0, x0=None, starts=OPTIMIZER_STARTS,
+                    screen_points=OPTIMIZER_SCREEN_POINTS, workers=OPTIMIZER_STARTS):
+    """Minimize an objective subject to a minimum safety factor over box-bounded design variables
+
+    `evaluate` maps an (n, d) array of designs to (objective, min_safety)
+    arrays of length n, so whole batches are evaluated at once. A full-factorial
+    screening grid is evaluated in one batch, then Nelder-Mead refinements of
+    a penalized objective run in parallel from the best screened designs and
+    from `x0` (a warm start, e.g. the previous optimum) when given. Variables
+    with equal bounds are held fixed.
+    """
+    bounds = np.asarray(bounds, dtype=np.float64)
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    free = upper > lower
+    evaluations = 0
+
+    axes = [np.linspace(lo, hi, screen_points if hi > lo else 1) for lo, hi in bounds]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(bounds))
+    objective, safety = (np.asarray(values, dtype=np.float64) for values in evaluate(grid))
+    evaluations += len(grid)
+
+    scale = max(float(np.nanmedian(np.abs(objective))), 1e-12)
+    shortfall = np.maximum(min_safety - safety, 0.0)
+    penalized = objective + OPTIMIZER_PENALTY * scale * shortfall
+
+    candidates = [grid[i] for i in np.argsort(penalized)[:starts]]
+    if x0 is not None:
+        candidates.insert(0, np.clip(np.asarray(x0, dtype=np.float64), lower, upper))
+
+    lock = threading.Lock()
+
+    def full_design(x_free):
+        x = lower.copy()
+        x[free] = np.clip(x_free, lower[free], upper[free])
+        return x
+
+    def penalized_objective(x_free):
+        nonlocal evaluations
+        value, margin = evaluate(full_design(x_free)[None, :])
+        with lock:
+            evaluations += 1
+        return float(value[0]) + OPTIMIZER_PENALTY * scale * max(min_safety - float(margin[0]), 0.0)
+
+    def refine(start):
+        result = scipy.optimize.minimize(
+            penalized_objective, start[free], method="Nelder-Mead", bounds=bounds[free],
+            options={"maxiter": OPTIMIZER_MAX_ITERATIONS, "xatol": 1e-4, "fatol": 1e-6 * scale})
+        return full_design(result.x)
+
+    if free.any():
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            refined = list(pool.map(refine, candidates))
+    else:
+        refined = []
+
+    designs = np.vstack(refined + [grid])
+    objective, safety = (np.asarray(values, dtype=np.float64) for values in evaluate(designs))
+    evaluations += len(designs)
+
+    feasible = safety >= min_safety
+    if feasible.any():
+        best = int(np.flatnonzero(feasible)[np.argmin(objective[feasible])])
+    else:
+        best = int(np.argmax(safety))
+
+    return {
+        "x": designs[best],
+        "objective": float(objective[best]),
+        "min_safety": float(safety[best]),
+        "feasible": bool(feasible[best]),
+        "evaluations": evaluations,
+    }
+
+
+class ResponseSurrogate:
+    """Polynomial response surface of positive responses over one input variable
+
+    Responses are fitted in log space against the (optionally log-scaled)
+    input, where the power laws of the load cases become low-order
+    polynomials. The degree is chosen by leave-one-out cross-validation and
+    the leave-one-out RMS residual is reported as the relative error of every
+    prediction. Queries outside the training range are not extrapolated.
+    """
+
+    def __init__(self, x, responses, log_scale=True, max_degree=SURROGATE_MAX_DEGREE):
+        x = np.asarray(x, dtype=np.float64)
+        self.log_scale = log_scale
+        self.lower, self.upper = float(x.min()), float(x.max())
+        self.names = list(responses)
+
+        u = np.log(x) if log_scale else x
+        self._u_range = (float(u.min()), float(max(u.max(), u.min() + 1e-12)))
+        t = self._normalize(x)
+        y = np.log(np.column_stack([np.asarray(responses[name], dtype=np.float64) for name in self.names]))
+
+        best = None
+        for degree in range(0, max(0, min(max_degree, len(x) - 2)) + 1):
+            basis = np.polynomial.legendre.legvander(t, degree)
+            coefficients = np.linalg.lstsq(basis, y, rcond=None)[0]
+            # Leave-one-out residuals from the diagonal of the hat matrix
+            leverage = np.einsum("ij,ji->i", basis, np.linalg.pinv(basis))
+            residuals = (y - basis @ coefficients) / np.maximum(1.0 - leverage, 1e-9)[:, None]
+            loo_rms = np.sqrt(np.mean(residuals**2, axis=0))
+            if best is None or loo_rms.max() < best[2].max():
+                best = (degree, coefficients, loo_rms)
+
+        self.degree, self.coefficients, self.loo_rms = best
+        self.samples = len(x)
+
+    def _normalize(self, x):
+        u = np.log(x) if self.log_scale else x
+        lower, upper = self._u_range
+        return 2.0 * (u - lower) / (upper - lower) - 1.0
+
+    def in_range(self, x):
+        """Whether x lies inside the training range"""
+        return self.lower <= x <= self.upper
+
+    def predict(self, x):
+        """Predicted value and relative error estimate of every response at x"""
+        log_values = np.polynomial.legendre.legval(self._normalize(float(x)), self.coefficients)
+        relative_errors = np.expm1(self.loo_rms)
+        return {name: (float(np.exp(log_values[i])), float(relative_errors[i])) for i, name in enumerate(self.names)}
@@ -0,0 +1,359 @@
+# DesignEdge.AI - Background job queue
+#
+# Long analyses run as jobs in a local process pool instead of inside the
+# Streamlit script run. Jobs are rows of a SQLite table (status, progress,
+# cancellation flag, pickled payload and result), so any app process can poll,
+# cancel or collect a job by id, and jobs still queued when an app process
+# exits are picked up again on the next start. Handlers are referenced by
+# "module:function" path and imported inside the worker process.
+#
+# Jobs run either in a process pool owned by the app (the default) or, with
+# DESIGNEDGE_JOB_WORKERS=0 in the app, in separate compute worker services
+# started with `python job_queue.py` that poll the shared queue.
+
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import functools
+import importlib
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+JOB_DIR = os.path.join(os.getenv("DESIGNEDGE_DATA_DIR", "data"), "jobs")
+JOB_WORKERS = int(os.getenv("DESIGNEDGE_JOB_WORKERS", str(os.cpu_count() or 2)))
+JOB_STALE_SECONDS = 600              # Running jobs without a heartbeat for this long are requeued on recovery
+JOB_HEARTBEAT_SECONDS = 30           # Running jobs refresh their heartbeat this often, between progress reports too
+WORKER_POLL_SECONDS = 0.5            # Idle compute workers check the queue this often
+JOB_RETENTION_SECONDS = 7 * 86400    # Finished jobs are purged after a week
+
+# Job kinds and the worker functions that run them: handler(payload, context) -> result
+JOB_HANDLERS = {
+    "load_case": "load_cases:load_case_job",
+}
+
+ACTIVE_STATES = ("queued", "running")
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT,
+    tag TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    error TEXT,
+    payload BLOB NOT NULL,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+# Columns added after the first release, created on existing job tables
+MIGRATIONS = {"tag": "ALTER TABLE jobs ADD COLUMN tag TEXT"}
+TAG_INDEX = "CREATE INDEX IF NOT EXISTS jobs_tag_created ON jobs (tag, created)"
+
+STATUS_COLUMNS = ("id", "kind", "label", "tag", "status", "stage", "progress", "cancel_requested",
+                  "created", "started", "finished", "error")
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobContext:
+    """Progress reporting and cancellation checks for a running job"""
+
+    def __init__(self, queue, job_id):
+        self._queue = queue
+        self.job_id = job_id
+
+    def heartbeat(self):
+        """Mark the job as alive without changing its progress"""
+        with self._queue._connect() as connection:
+            connection.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                               (time.time(), self.job_id))
+
+    def progress(self, fraction, stage):
+        """Record progress; raises JobCancelled when cancellation was requested"""
+        with self._queue._connect() as connection:
+            connection.execute("UPDATE jobs SET progress = ?, stage = ?, heartbeat = ? WHERE id = ?",
+                               (fraction, stage, time.time(), self.job_id))
+            cancel = connection.execute("SELECT cancel_requested FROM jobs WHERE id = ?",
+                                        (self.job_id,)).fetchone()
+        if cancel is not None and cancel[0]:
+            raise JobCancelled(self.job_id)
+
+
+def run_job(root, job_id):
+    """Worker entry point: claim a queued job, run its handler and record the outcome"""
+    JobQueue(root, workers=0).run(job_id)
+
+
+def work(root=JOB_DIR, poll_seconds=WORKER_POLL_SECONDS):
+    """Compute worker loop: run queued jobs as they arrive, oldest first"""
+    queue = JobQueue(root, workers=0)
+    last_recovery = 0.0
+    while True:
+        if time.time() - last_recovery > JOB_STALE_SECONDS / 10:
+            queue.requeue_stale()
+            last_recovery = time.time()
+        if queue.run_next() is None:
+            time.sleep(poll_seconds)
+
+
+def serve(root=JOB_DIR, workers=JOB_WORKERS, poll_seconds=WORKER_POLL_SECONDS):
+    """Standalone compute service: keep `workers` worker processes polling the queue"""
+    context = multiprocessing.get_context("spawn")
+    processes = [None] * max(workers, 1)
+    while True:
+        for i, process in enumerate(processes):
+            if process is None or not process.is_alive():
+                # (Re)start workers, e.g. after one was killed for running out of memory
+                processes[i] = context.Process(target=work, args=(root, poll_seconds), name=f"job-worker-{i}")
+                processes[i].start()
+        time.sleep(5)
+
+
+class JobQueue:
+    """SQLite-backed job table served by a spawn-context process pool
+
+    Cancellation is cooperative: a queued job is cancelled at once, a running
+    job stops at its next progress report. A job whose pool worker dies
+    (e.g. out of memory) is marked failed at once. With workers=0 jobs are only
+    queued, for compute workers running serve() against the same root.
+    """
+
+    def __init__(self, root=JOB_DIR, workers=JOB_WORKERS):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.db_path = os.path.join(root, "jobs.sqlite")
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    connection.execute(statement)
+            connection.execute(TAG_INDEX)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across threads, app processes and workers
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _dispatch(self, job_id):
+        if self.workers <= 0:
+            return
+        with self._lock:
+            for attempt in range(2):
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+                try:
+                    future = self._executor.submit(run_job, self.root, job_id)
+                    future.add_done_callback(functools.partial(self._collect, job_id))
+                    return
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory); start a fresh pool and resubmit
+                    self._executor = None
+                    if attempt:
+                        raise
+
+    def _collect(self, job_id, future):
+        # run_job records handler outcomes itself, so an exception here means the worker process died
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        with self._connect() as connection:
+            failed = connection.execute(
+                "UPDATE jobs SET status = 'failed', stage = 'Failed', error = ?, finished = ? "
+                "WHERE id = ? AND status = 'running'",
+                (f"Worker process died: {type(error).__name__}: {str(error)}", time.time(), job_id)).rowcount
+        if not failed and isinstance(error, BrokenProcessPool) and (self.status(job_id) or {}).get("status") == "queued":
+            # Waiting in a pool that another job brought down: run it in a fresh pool
+            self._dispatch(job_id)
+
+    def submit(self, kind, payload, label=None, tag=None):
+        """Queue a job and return its id; `tag` groups jobs for find() (e.g. the design they analyse)"""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = uuid.uuid4().hex
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, label, tag, status, stage, created, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, label, tag, "queued", "Waiting for a worker", time.time(),
+                 pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+        self._dispatch(job_id)
+        return job_id
+
+    def requeue_stale(self):
+        """Return running jobs without a heartbeat for JOB_STALE_SECONDS (dead worker) to the queue"""
+        with self._connect() as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'Requeued after worker loss' "
+                "WHERE status = 'running' AND COALESCE(heartbeat, started) < ?",
+                (time.time() - JOB_STALE_SECONDS,)
+            ).rowcount
+
+    def recover(self):
+        """Requeue jobs orphaned by a dead worker and dispatch every queued job; returns their number"""
+        self.requeue_stale()
+        with self._connect() as connection:
+            job_ids = [row[0] for row in connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created")]
+        for job_id in job_ids:
+            self._dispatch(job_id)
+        return len(job_ids)
+
+    def status(self, job_id):
+        """Status, stage and progress of a job (None if unknown)"""
+        with self._connect() as connection:
+            row = connection.execute(f"SELECT {', '.join(STATUS_COLUMNS)} FROM jobs WHERE id = ?",
+                                     (job_id,)).fetchone()
+        return {column: row[column] for column in STATUS_COLUMNS} if row else None
+
+    def find(self, tag, statuses=None):
+        """Statuses of the jobs with a tag, newest first, optionally filtered by status"""
+        query = f"SELECT {', '.join(STATUS_COLUMNS)} FROM jobs WHERE tag = ?"
+        params = (tag,)
+        if statuses:
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params += tuple(statuses)
+        with self._connect() as connection:
+            rows = connection.execute(query + " ORDER BY created DESC", params).fetchall()
+        return [{column: row[column] for column in STATUS_COLUMNS} for row in rows]
+
+    def payload(self, job_id):
+        """Payload a job was submitted with (None if unknown)"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def result(self, job_id):
+        """Return value of a finished job (None unless the job is done)"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'",
+                                     (job_id,)).fetchone()
+        return pickle.loads(row[0]) if row and row[0] is not None else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running job to stop at its next progress report"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'cancelled', stage = 'Cancelled', finished = ? "
+                "WHERE id = ? AND status = 'queued'", (now, job_id))
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1, stage = 'Cancelling' WHERE id = ? AND status = 'running'",
+                (job_id,))
+        return self.status(job_id)
+
+    def list_jobs(self, statuses=None, limit=50):
+        """Job statuses, newest first, optionally filtered by status"""
+        query = f"SELECT {', '.join(STATUS_COLUMNS)} FROM jobs"
+        params = ()
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params = tuple(statuses)
+        query += " ORDER BY created DESC LIMIT ?"
+        with self._connect() as connection:
+            rows = connection.execute(query, params + (limit,)).fetchall()
+        return [{column: row[column] for column in STATUS_COLUMNS} for row in rows]
+
+    def counts(self):
+        """Number of jobs per status"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(ACTIVE_STATES + FINISHED_STATES, 0)
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        """Delete finished jobs older than the retention period"""
+        with self._connect() as connection:
+            connection.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATES))}) AND finished < ?",
+                FINISHED_STATES + (time.time() - older_than,))
+
+    def _finish(self, job_id, status, stage, error=None, result=None):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, result = ?, finished = ?, "
+                "progress = CASE WHEN ? = 'done' THEN 1.0 ELSE progress END WHERE id = ?",
+                (status, stage, error, result, time.time(), status, job_id))
+
+    def run_next(self):
+        """Run the oldest queued job in the current process; returns its id, or None when the queue is empty"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+        if row is None:
+            return None
+        # Another worker may claim it first; run() is then a no-op and the caller simply polls again
+        self.run(row[0])
+        return row[0]
+
+    def run(self, job_id):
+        """Run a queued job in the current process (no-op if another worker claimed or cancelled it)"""
+        now = time.time()
+        with self._connect() as connection:
+            claimed = connection.execute(
+                "UPDATE jobs SET status = 'running', stage = 'Starting', started = ?, heartbeat = ? "
+                "WHERE id = ? AND status = 'queued'", (now, now, job_id)).rowcount
+            row = connection.execute("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not claimed or row is None:
+            return
+
+        module_name, function_name = JOB_HANDLERS[row["kind"]].split(":")
+        context = JobContext(self, job_id)
+
+        # Heartbeat from a timer thread: long stages between progress reports must not look like a dead worker
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(JOB_HEARTBEAT_SECONDS):
+                try:
+                    context.heartbeat()
+                except sqlite3.Error:
+                    # Busy database: the next beat retries well within JOB_STALE_SECONDS
+                    pass
+
+        threading.Thread(target=beat, name=f"job-heartbeat-{job_id[:8]}", daemon=True).start()
+        try:
+            handler = getattr(importlib.import_module(module_name), function_name)
+            result = handler(pickle.loads(row["payload"]), context)
+        except JobCancelled:
+            self._finish(job_id, "cancelled", "Cancelled")
+        except Exception as e:
+            self._finish(job_id, "failed", "Failed", error=f"{type(e).__name__}: {str(e)}")
+        else:
+            self._finish(job_id, "done", "Completed", result=pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        finally:
+            stopped.set()
+
+
+if __name__ == "__main__":
+    print(f"Serving jobs from {JOB_DIR} with {JOB_WORKERS} worker processes")
+    serve()
@@ -0,0 +1,833 @@
+# DesignEdge.AI - Load case models
+#
+# Loading, solve and post-processing stages of the drop, vibration, transport
+# and stacking load cases, wired into an AnalysisGraph. Nothing here imports
+# Streamlit: the app evaluates the graph in-process for what-if and design
+# studies, and job_queue.py workers evaluate it for full analyses.
+
+import math
+import random
+
+import numpy as np
+import pandas as pd
+
+import fatigue
+import fea_utils
+import material_library
+import metrics
+import profiling
+import route_library
+import spectral
+import tracing
+import track_import
+
+# Material the load-case stress formulas are calibrated for (at the analysed wall thickness)
+REFERENCE_DESIGN_MATERIAL = "PP"
+REFERENCE_PACKAGE_MASS_KG = 1.0  # Mass the stress calibrations were made for
+
+# Default wall thickness when no analysed geometry is available (m)
+DEFAULT_WALL_THICKNESS = {"Cardboard": 0.004}
+DEFAULT_PLASTIC_WALL_THICKNESS = 0.0015
+
+SOLVER_VERSION = 5   # Bump when the load-case models change: stored runs and stored load stages are keyed on it
+
+LOAD_CASE_INPUTS = ("test_type", "seed", "height_m", "g_force", "frequency_range", "distance_km", "route_type",
+                    "dimensions_m", "wall_thickness_m", "boxes_above", "box_weight", "environment_factor",
+                    "psd_source", "test_minutes", "route_segments", "route_lookup", "track_key")
+
+TRANSPORT_SAMPLE_SECONDS = 30.0   # Uniform time step the transport g-history is resampled to for its spectrum
+TRACK_SAMPLE_SECONDS = 1.0        # Same for recorded tracks, which resolve the route every few metres
+
+
+# Enhanced live transport simulation with realistic speed patterns
+def generate_transport_simulation(distance_km, route_type, max_points=2000, mass_kg=1.0, rng=random):
+    """Generate realistic truck transport simulation with variable speed patterns
+
+    `route_type` is a route library name or a route profile; its road-class
+    segments set the speed model along the route and its elevation profile
+    (stretched to `distance_km`) replaces the synthetic terrain.
+    """
+    # Create distance points (two samples per km, optionally capped)
+    num_points = distance_km * 2 if max_points is None else min(max_points, distance_km * 2)
+    distance_points = np.linspace(0, distance_km, num_points)
+
+    # Initialize arrays
+    speeds = []
+    g_forces = []
+    forces = []
+    elevations = []
+
+    # Road class of every sample from the route's segment plan
+    profile = route_library.resolve_route(route_type)
+    plan = route_library.segment_plan(profile)
+    segment_ends = np.array([end for _, _, end in plan])
+    sample_segments = np.minimum(np.searchsorted(segment_ends, distance_points / distance_km, side="right"),
+                                 len(plan) - 1)
+
+    terrain = np.asarray(profile["elevation_profile"], dtype=np.float64) if profile.get("elevation_profile") else None
+    if terrain is not None:
+        terrain_scale = (route_library.route_length(profile) or terrain[-1, 0]) / distance_km
+
+    # Generate realistic speed and acceleration patterns
+    for i, distance in enumerate(distance_points):
+        progress = distance / distance_km
+        params = plan[sample_segments[i]][0]
+        base_speed = params["base_speed"]
+        speed_variation = params["speed_variation"]
+
+        # Determine driving pattern from the road class of this part of the route
+        if params["model"] == "stop_and_go":
+            # City driving phase
+
+            # Traffic light simulation
+            traffic_light_factor = 1.0
+            if i > 0 and rng.random() < 0.15:  # 15% chance of traffic light
+                traffic_light_factor = 0.2 if rng.random() < 0.6 else 1.0
+
+            # Rush hour simulation
+            rush_hour_factor = 0.7 if (progress < 0.1 or progress > 0.8) and rng.random() < 0.3 else 1.0
+
+            current_speed = base_speed * traffic_light_factor * rush_hour_factor
+            current_speed += rng.uniform(-speed_variation, speed_variation)
+
+        else:
+            # Highway driving phase
+
+            # Highway congestion simulation
+            congestion_factor = 0.6 if rng.random() < 0.1 else 1.0  # 10% chance of congestion
+
+            # Weather/construction factor
+            weather_factor = 0.8 if rng.random() < 0.05 else 1.0  # 5% chance of weather/construction
+
+            current_speed = base_speed * congestion_factor * weather_factor
+            current_speed += rng.uniform(-speed_variation, speed_variation)
+
+        # Ensure realistic speed limits
+        current_speed = max(5, min(current_speed, 120))
+        speeds.append(current_speed)
+
+        # Calculate acceleration and G-forces
+        if i > 0:
+            speed_diff = current_speed - speeds[i-1]
+            time_diff = (distance_points[i] - distance_points[i-1]) / max(speeds[i-1], 1) * 3.6  # Convert to seconds
+            acceleration = speed_diff / max(time_diff, 0.1) / 3.6  # m/s²
+
+            # Add road surface variations
+            road_surface_g = rng.uniform(-0.3, 0.3) * params["roughness"]
+
+            # Add turning and braking effects
+            turning_g = rng.uniform(-0.2, 0.2) if rng.random() < 0.3 else 0
+
+            # Calculate total G-force
+            total_g = abs(acceleration / 9.81) + abs(road_surface_g) + abs(turning_g)
+
+            # Add elevation changes
+            if terrain is not None:
+                terrain_height = np.interp(distance * terrain_scale, terrain[:, 0], terrain[:, 1])
+            else:
+                terrain_height = 50 * np.sin(distance * 0.01)
+            elevation_change = terrain_height + rng.uniform(-20, 20)
+            elevations.append(elevation_change)
+
+            # Additional G-force from elevation changes
+            if i > 1:
+                elevation_g = abs(elevations[i-1] - elevations[i-2]) * 0.001
+                total_g += elevation_g
+
+            g_forces.append(max(0.5, min(total_g, 4.5)))  # Realistic G-force range
+
+            # Calculate force on the package
+            package_force = total_g * 9.81 * mass_kg
+            forces.append(package_force)
+        else:
+            g_forces.append(1.0)
+            forces.append(9.81 * mass_kg)
+            elevations.append(0)
+
+    return {
+        'distance_points': distance_points,
+        'speeds': speeds,
+        'g_forces': g_forces,
+        'forces': forces,
+        'elevations': elevations,
+        'max_speed': max(speeds),
+        'max_g_force': max(g_forces),
+        'avg_speed': np.mean(speeds),
+        'total_time_hours': distance_km / np.mean(speeds)
+    }
+
+# Replay of an imported GPS track
+def replay_transport_track(track_key, mass_kg=1.0):
+    """Transport trace of an imported GPS track, with the keys of generate_transport_simulation()
+
+    The g level is the magnitude of the vertical and longitudinal
+    accelerations derived from the track's elevation and speed profiles.
+    """
+    motion = track_import.track_accelerations(track_import.load_track(track_key))
+    g_forces = np.hypot(motion['vertical_g'], motion['longitudinal_g'])
+    speeds = motion['speed_kmh']
+
+    return {
+        'distance_points': motion['distance_km'],
+        'speeds': speeds,
+        'g_forces': g_forces,
+        'forces': g_forces * 9.81 * mass_kg,
+        'elevations': motion['elevation_m'],
+        'max_speed': float(np.max(speeds)),
+        'max_g_force': float(np.max(g_forces)),
+        'max_vertical_g': float(np.max(np.abs(motion['vertical_g']))),
+        'max_longitudinal_g': float(np.max(np.abs(motion['longitudinal_g']))),
+        'avg_speed': float(np.mean(speeds)),
+        'total_time_hours': motion['hours']
+    }
+
+# Build multi-resolution pyramid for long transport traces
+def build_transport_overview(transport_data, max_points=2000):
+    """Persist the full transport trace as a min/max/mean pyramid and return a decimated overview"""
+    if transport_data is None:
+        return None
+
+    try:
+        meta = fea_utils.build_trace_pyramid(
+            transport_data['distance_points'],
+            {
+                'speeds': transport_data['speeds'],
+                'g_forces': transport_data['g_forces'],
+                'forces': transport_data['forces'],
+                'elevations': transport_data['elevations']
+            }
+        )
+    except OSError:
+        # No writable data directory: keep the full trace in memory instead
+        return transport_data
+
+    overview = fea_utils.query_trace_pyramid(meta['key'], max_points=max_points)
+
+    transport_data = dict(transport_data)
+    transport_data['pyramid_key'] = meta['key']
+    transport_data['samples'] = meta['samples']
+    transport_data['distance_points'] = overview['distance']
+    for channel in ['speeds', 'g_forces', 'forces', 'elevations']:
+        transport_data[channel] = overview[channel]['mean']
+
+    return transport_data
+
+def parse_frequency_range(frequency_range):
+    """(min, max) Hz of a vibration frequency range label"""
+    if "5-50" in frequency_range:
+        return 5, 50
+    elif "5-100" in frequency_range:
+        return 5, 100
+    elif "5-200" in frequency_range:
+        return 5, 200
+    elif "10-300" in frequency_range:
+        return 10, 300
+    return 5, 200
+
+def transport_spectrum(transport_data, sample_seconds=TRANSPORT_SAMPLE_SECONDS):
+    """Welch PSD of the dynamic g-history of a full-resolution transport trace over travel time
+
+    The simulation resolves the route at two samples per km, so the spectrum
+    covers millihertz journey dynamics; its RMS is the field level carried
+    over to the equivalent vibration test.
+    """
+    # Short routes get shorter segments so a few of them are averaged
+    hours = float(transport_data['total_time_hours'])
+    segment = int(min(spectral.WELCH_SEGMENT, max(16, hours * 3600.0 / sample_seconds / 4)))
+
+    accumulator = spectral.WelchAccumulator(1.0 / sample_seconds, segment)
+    for chunk in spectral.uniform_time_chunks(transport_data['distance_points'], transport_data['speeds'],
+                                              transport_data['g_forces'], sample_seconds):
+        accumulator.add(chunk)
+
+    frequencies, psd = accumulator.psd() or (np.zeros(0), np.zeros(0))
+    return {
+        "frequencies": frequencies,
+        "psd": psd,
+        "grms": spectral.band_rms(frequencies, psd),
+        "sample_seconds": sample_seconds,
+        "hours": hours
+    }
+
+def compute_route_signature(profile, distance_km):
+    """Statistical signature of a route profile from a seeded full-resolution simulation"""
+    rng = random.Random(f"{route_library.SIGNATURE_SEED}:{profile.get('name')}")
+    transport_data = generate_transport_simulation(int(distance_km), profile, max_points=None, mass_kg=1.0, rng=rng)
+    g_forces = np.asarray(transport_data['g_forces'])
+
+    cycles = fatigue.rainflow_matrix(g_forces)
+    spectrum = transport_spectrum(transport_data)
+    above = g_forces >= route_library.SHOCK_G
+
+    return {
+        "distance_km": float(distance_km),
+        "hours": float(transport_data['total_time_hours']),
+        "samples": float(g_forces.size),
+        "max_g": float(transport_data['max_g_force']),
+        "shocks": float(np.count_nonzero(above[1:] & ~above[:-1])),
+        "g_counts": np.histogram(g_forces, bins=route_library.G_HISTOGRAM_EDGES)[0].astype(np.float64),
+        "cycle_range": cycles["range"],
+        "cycle_mean": cycles["mean"],
+        "cycle_count": cycles["count"],
+        "cycle_resolution": cycles["resolution"],
+        "psd_frequencies": spectrum["frequencies"],
+        "psd": spectrum["psd"],
+        "sample_seconds": spectrum["sample_seconds"],
+    }
+
+def road_class_signature(road_class):
+    """Signature of driving on one road class, the building block of custom routes"""
+    profile = {"name": road_class, "segments": [{"road_class": road_class, "fraction": 1.0}]}
+    return route_library.cached_signature(profile, route_library.SIGNATURE_MIN_KM, compute_route_signature)
+
+def get_route_signature(route_type, distance_km, segments=None):
+    """Stored signature of a route scaled to `distance_km` (computed and stored on first use)
+
+    Lanes are simulated over their own length and generic route types over
+    SIGNATURE_MIN_KM; custom routes add up the road-class signatures of their
+    segments, so editing one segment only changes its share of the sum.
+    """
+    if route_type == route_library.CUSTOM_ROUTE:
+        signature = route_library.compose_signatures(
+            [(road_class_signature(road_class), float(length_km)) for road_class, length_km in segments])
+    else:
+        profile = route_library.resolve_route(route_type)
+        simulated_km = route_library.route_length(profile) or route_library.SIGNATURE_MIN_KM
+        signature = route_library.cached_signature(profile, simulated_km, compute_route_signature)
+    return route_library.scale_signature(signature, distance_km)
+
+def signature_spectrum(signature):
+    """transport_spectrum()-style summary of a route signature"""
+    return {
+        "frequencies": signature["psd_frequencies"],
+        "psd": signature["psd"],
+        "grms": spectral.band_rms(signature["psd_frequencies"], signature["psd"]),
+        "sample_seconds": signature["sample_seconds"],
+        "hours": signature["hours"]
+    }
+
+# Generate vibration frequency response data
+def generate_vibration_response(g_force, frequency_range, rng=random, points=200):
+    """Generate vibration frequency response data for visualization"""
+    freq_min, freq_max = parse_frequency_range(frequency_range)
+
+    # Generate frequency points
+    frequencies = np.linspace(freq_min, freq_max, points)
+    
+    # Generate realistic frequency response
+    response_amplitude = []
+    phase_angle = []
+    
+    for freq in frequencies:
+        # Natural frequencies (resonances) for typical packaging
+        natural_freqs = [15, 35, 85, 150, 220]  # Hz
+        
+        amplitude = g_force
+        phase = 0
+        
+        # Add resonance peaks
+        for nat_freq in natural_freqs:
+            if freq_min <= nat_freq <= freq_max:
+                # Resonance peak calculation
+                damping_ratio = 0.05  # 5% damping
+                freq_ratio = freq / nat_freq
+                
+                # Amplitude magnification
+                mag_factor = 1 / ((1 - freq_ratio**2)**2 + (2 * damping_ratio * freq_ratio)**2)**0.5
+                amplitude *= (1 + mag_factor * 0.3)  # 30% amplification at resonance
+                
+                # Phase shift
+                phase += math.atan2(2 * damping_ratio * freq_ratio, 1 - freq_ratio**2) * 180 / math.pi
+        
+        # High frequency attenuation
+        if freq > 100:
+            amplitude *= (100 / freq) ** 0.5
+            
+        # Add some random variation
+        amplitude += rng.uniform(-0.05, 0.05)
+        phase += rng.uniform(-5, 5)
+        
+        response_amplitude.append(max(0.1, amplitude))
+        phase_angle.append(phase)
+    
+    return {
+        'frequencies': frequencies,
+        'amplitude': response_amplitude,
+        'phase': phase_angle,
+        'natural_frequencies': natural_freqs
+    }
+
+# Analysis graph stages: geometry -> mesh -> loads -> material -> solve -> post
+def analysis_geometry_stage(inputs):
+    """Geometry analysis of the model being analysed"""
+    model_hash = inputs.get('model_hash')
+    return fea_utils.load_model_analysis(model_hash) if model_hash else None
+
+def analysis_mesh_stage(inputs, geometry):
+    """Discretization used by the load cases (viewer LOD levels of the model)"""
+    model_hash = inputs.get('model_hash')
+    return fea_utils.load_model_meta(model_hash) if model_hash else None
+
+def load_case_rng(seed, test_type):
+    """Random stream of one load case: seeded runs reproduce their stochastic loads in any process"""
+    return random if seed is None else random.Random(f"{seed}:{test_type}")
+
+def analysis_loads_stage(inputs, mesh):
+    """Material-independent loading of a load case (per kg of package mass where mass matters)"""
+    test_type = inputs['test_type']
+    rng = load_case_rng(inputs.get('seed'), test_type)
+
+    if test_type == "drop":
+        height_m = inputs.get('height_m', 1.0)
+        return {
+            "height_m": height_m,
+            "velocity": math.sqrt(2 * 9.81 * height_m)
+        }
+
+    elif test_type == "vibration":
+        frequency_range = inputs.get('frequency_range', '5-200 Hz')
+        band = parse_frequency_range(frequency_range)
+
+        if inputs.get('psd_source') == "transport":
+            # Test level derived from the stored signature of a transport route
+            spectrum = signature_spectrum(get_route_signature(
+                inputs.get('route_type', 'Mixed (City + Highway)'), inputs.get('distance_km', 1000),
+                inputs.get('route_segments')))
+            test_psd = spectral.equivalent_test_psd(spectrum["grms"], spectrum["hours"], band,
+                                                    inputs.get('test_minutes', spectral.DEFAULT_TEST_MINUTES))
+            g_force = test_psd["grms"]
+        else:
+            g_force = inputs.get('g_force', 1.15)
+            test_psd = spectral.scaled_profile_psd(g_force, band)
+
+        return {
+            "g_force": g_force,
+            "frequency_range": frequency_range,
+            "test_psd": test_psd,
+            "vibration_response": generate_vibration_response(g_force, frequency_range, rng=rng)
+        }
+
+    elif test_type == "live_transport":
+        distance_km = inputs.get('distance_km', 1000)
+        route_type = inputs.get('route_type', 'Mixed (City + Highway)')
+        segments = inputs.get('route_segments')
+
+        if inputs.get('route_lookup') and not inputs.get('track_key'):
+            # Statistics of the route from its stored signature instead of a new simulation
+            signature = get_route_signature(route_type, distance_km, segments)
+            spectrum = signature_spectrum(signature)
+            spectrum["test_psd"] = spectral.equivalent_test_psd(spectrum["grms"], spectrum["hours"],
+                                                                parse_frequency_range("5-200 Hz"))
+            return {"transport_data": None, "max_g": signature["max_g"], "cycles": route_library.cycle_matrix(signature),
+                    "spectrum": spectrum, "distance_km": distance_km,
+                    "route_signature": route_library.summarize(signature)}
+
+        if inputs.get('track_key'):
+            # Recorded lane: replay the imported track over its own length (forces per kg)
+            transport_data = replay_transport_track(inputs['track_key'], mass_kg=1.0)
+            distance_km = float(transport_data['distance_points'][-1])
+            sample_seconds = TRACK_SAMPLE_SECONDS
+        else:
+            # Generate realistic transport simulation at full resolution (forces per kg)
+            transport_data = generate_transport_simulation(distance_km, route_library.resolve_route(route_type, segments),
+                                                           max_points=None, mass_kg=1.0, rng=rng)
+            sample_seconds = TRANSPORT_SAMPLE_SECONDS
+
+        # Cycle and frequency content, from the full-resolution g history
+        cycles = fatigue.rainflow_matrix(transport_data['g_forces'])
+        spectrum = transport_spectrum(transport_data, sample_seconds)
+        spectrum["test_psd"] = spectral.equivalent_test_psd(spectrum["grms"], spectrum["hours"],
+                                                            parse_frequency_range("5-200 Hz"))
+
+        # Store the full trace as an on-disk pyramid and keep only an overview in memory
+        transport_data = build_transport_overview(transport_data)
+        return {"transport_data": transport_data, "max_g": transport_data['max_g_force'],
+                "cycles": cycles, "spectrum": spectrum, "distance_km": distance_km, "route_signature": None}
+
+    elif test_type == "stacking":
+        box_weight = inputs.get('box_weight', 1.5)
+        boxes_above = inputs.get('boxes_above', 3)
+        return {
+            "dimensions": inputs.get('dimensions_m', (0.3, 0.2, 0.25)),
+            "thickness": inputs.get('wall_thickness_m'),
+            "box_weight": box_weight,
+            "boxes_above": boxes_above,
+            "environment_factor": inputs.get('environment_factor', 1.0),
+            "stacking_load": boxes_above * box_weight * 9.81,
+            "sweep_boxes": np.arange(0, max(2 * boxes_above, 20) + 1)
+        }
+
+def analysis_material_stage(inputs, geometry):
+    """Material properties and the resulting package mass"""
+    return {
+        "material": inputs.get('material', 'PP'),
+        "props": inputs['material_props'],
+        "mass_kg": inputs.get('mass_kg', REFERENCE_PACKAGE_MASS_KG)
+    }
+
+def solve_load_case(test_type, loads, props, mass_kg, wall_thickness=None, thickness_scale=1.0):
+    """Max stress (MPa) and safety factor of a load case, broadcasting over candidate designs
+
+    The stress formulas are calibrated on the reference design (REFERENCE_DESIGN_MATERIAL
+    walls at the analysed thickness carrying REFERENCE_PACKAGE_MASS_KG) and scaled with
+    package mass, wall stiffness and wall thickness. The safety factor is the material
+    yield strength over that stress.
+    """
+    reference = material_library.BUILTIN_MATERIALS[REFERENCE_DESIGN_MATERIAL]
+    reference_stress = reference["yield_strength"] / 1e6
+    yield_mpa = np.asarray(props["yield_strength"]) / 1e6
+    mass_ratio = np.asarray(mass_kg) / REFERENCE_PACKAGE_MASS_KG
+    thickness_scale = np.asarray(thickness_scale, dtype=np.float64)
+
+    if test_type == "drop":
+        # Elastic impact on a wall: peak stress ~ sqrt(E x impact energy / t)
+        stiffness_ratio = np.asarray(props["youngs_modulus"]) / reference["youngs_modulus"]
+        max_stress = reference_stress * 0.4 * np.sqrt(
+            loads["height_m"] / 1.0 * mass_ratio * stiffness_ratio / thickness_scale)
+
+    elif test_type == "vibration":
+        # Inertial wall bending: stress ~ mass x acceleration / t^2
+        max_stress = reference_stress * 0.2 * (loads["g_force"] / 1.15) * mass_ratio / thickness_scale**2
+
+    elif test_type == "live_transport":
+        # Linear in g: the same factor maps the g-history cycles to stress cycles for fatigue
+        stress_per_g = reference_stress * 0.15 / 2.0 * mass_ratio / thickness_scale**2
+        max_stress = stress_per_g * loads["max_g"]
+        return {"max_stress": max_stress, "safety_factor": yield_mpa / max_stress, "stress_per_g": stress_per_g}
+
+    elif test_type == "stacking":
+        dimensions = loads["dimensions"]
+        thickness = wall_thickness * thickness_scale
+
+        strength = fea_utils.box_compression_strength(
+            dimensions[0], dimensions[1], dimensions[2], thickness,
+            np.asarray(props["youngs_modulus"]), np.asarray(props["poisson_ratio"]),
+            np.asarray(props["yield_strength"]), corrugated=props.get("corrugated", False),
+            edge_crush=props.get("edge_crush")
+        )
+        wall_area = 2 * (dimensions[0] + dimensions[1]) * thickness
+
+        return {
+            "max_stress": loads["stacking_load"] / wall_area / 1e6,
+            "safety_factor": fea_utils.stacking_safety_factors(
+                strength["capacity_n"], loads["box_weight"], loads["boxes_above"], loads["environment_factor"]),
+            "capacity_n": strength["capacity_n"],
+            "failure_mode": strength["mode"]
+        }
+
+    return {"max_stress": max_stress, "safety_factor": yield_mpa / max_stress}
+
+def analysis_solve_stage(inputs, loads, material):
+    """Stresses and safety factors for the load case with the given material"""
+    test_type = inputs['test_type']
+    thickness = None
+    if test_type == "stacking":
+        thickness = loads["thickness"] or DEFAULT_WALL_THICKNESS.get(material["material"], DEFAULT_PLASTIC_WALL_THICKNESS)
+
+    solution = solve_load_case(test_type, loads, material["props"], material["mass_kg"],
+                               wall_thickness=thickness, thickness_scale=inputs.get('thickness_scale', 1.0))
+    result = {
+        "max_stress": float(solution["max_stress"]),
+        "safety_factor": float(solution["safety_factor"])
+    }
+
+    if test_type == "live_transport":
+        props = material["props"]
+        result["fatigue"] = fatigue.transport_fatigue(
+            loads["cycles"], loads["distance_km"], float(solution["stress_per_g"]),
+            props["ultimate_strength"] / 1e6, fatigue.sn_exponent(material["material"], props))
+
+    if test_type == "stacking":
+        capacity = float(solution["capacity_n"])
+        result.update({
+            "capacity_n": capacity,
+            "failure_mode": str(solution["failure_mode"]),
+            # Vectorized sweep over stack heights for the capacity curve
+            "sweep_safety": fea_utils.stacking_safety_factors(
+                capacity, loads["box_weight"], loads["sweep_boxes"], loads["environment_factor"])
+        })
+
+    return result
+
+def analysis_post_stage(inputs, loads, material, solve):
+    """Assemble the result dictionary shown in the results views"""
+    mass_kg = material["mass_kg"]
+    test_type = inputs['test_type']
+
+    result = {
+        "max_stress": solve["max_stress"],
+        "safety_factor": solve["safety_factor"],
+        "compliance": "PASS" if solve["safety_factor"] > 2.0 else "FAIL"
+    }
+
+    if test_type == "drop":
+        result.update({
+            "velocity": loads["velocity"],
+            "kinetic_energy": 0.5 * mass_kg * loads["velocity"]**2,
+            "mass_kg": mass_kg
+        })
+
+    elif test_type == "vibration":
+        result.update({
+            "vibration_response": loads["vibration_response"],
+            "test_psd": loads["test_psd"],
+            "g_force": loads["g_force"],
+            "frequency_range": loads["frequency_range"],
+            "mass_kg": mass_kg
+        })
+
+    elif test_type == "live_transport":
+        # Forces were simulated per kg; scale the overview and record the factor for pyramid queries
+        transport_data = None
+        if loads["transport_data"] is not None:
+            transport_data = dict(loads["transport_data"])
+            transport_data['forces'] = np.asarray(transport_data['forces']) * mass_kg
+            transport_data['force_scale'] = mass_kg
+        result.update({
+            "transport_data": transport_data,
+            "max_g_force": loads["max_g"],
+            "fatigue": solve["fatigue"],
+            "spectrum": loads["spectrum"],
+            "route_signature": loads["route_signature"],
+            "mass_kg": mass_kg
+        })
+
+    elif test_type == "stacking":
+        result.update({
+            "capacity_n": solve["capacity_n"],
+            "failure_mode": solve["failure_mode"],
+            "stacking_load": loads["stacking_load"],
+            "boxes_above": loads["boxes_above"],
+            "box_weight": loads["box_weight"],
+            "environment_factor": loads["environment_factor"],
+            "max_boxes_above": int(fea_utils.max_stack_height(
+                solve["capacity_n"], loads["box_weight"], loads["environment_factor"])),
+            "sweep": {"boxes_above": loads["sweep_boxes"], "safety_factor": solve["sweep_safety"]}
+        })
+
+    return result
+
+def loads_stage_version(inputs):
+    """Solver version and route definition the loads of a load case were computed with
+
+    Routes are passed by name, so an edited routes.json must not reuse loads
+    stored for the old definition. Tracks are passed by their content hash.
+    """
+    route = None
+    route_type = inputs.get('route_type', 'Mixed (City + Highway)')
+    if inputs.get('test_type') in ("vibration", "live_transport") and route_type != route_library.CUSTOM_ROUTE:
+        route = route_library.signature_key(route_library.resolve_route(route_type), None)
+    return {"solver": SOLVER_VERSION, "route": route}
+
+def build_analysis_graph(store_dir=fea_utils.STAGE_STORE_DIR):
+    """Analysis graph wiring the load case stages together
+
+    Seeded load stages are stored under store_dir, so the design studies run
+    in the app process reuse the loads computed by the job queue workers.
+    """
+    graph = fea_utils.AnalysisGraph(store_dir)
+    graph.add_stage("geometry", analysis_geometry_stage, inputs=("model_hash",))
+    graph.add_stage("mesh", analysis_mesh_stage, inputs=("model_hash",), deps=("geometry",))
+    # Unseeded loads draw from the global random stream and are not reproducible
+    graph.add_stage("loads", analysis_loads_stage, inputs=LOAD_CASE_INPUTS, deps=("mesh",),
+                    persist=lambda inputs: inputs.get('seed') is not None, version=loads_stage_version)
+    graph.add_stage("material", analysis_material_stage, inputs=("material", "material_props", "mass_kg"),
+                    deps=("geometry",))
+    graph.add_stage("solve", analysis_solve_stage, inputs=("test_type", "thickness_scale"),
+                    deps=("loads", "material"))
+    graph.add_stage("post", analysis_post_stage, inputs=("test_type",), deps=("loads", "material", "solve"))
+    return graph
+
+def evaluate_load_case(graph, inputs):
+    """Evaluate one load case through the analysis graph, recomputing only invalidated stages"""
+    test_type = inputs['test_type']
+    with tracing.span(f"solve.{test_type}", "solve") as span:
+        # Copy so callers can annotate results without touching the cached stage value
+        result = dict(graph.evaluate("post", inputs, scope=test_type))
+        span.set(computed=",".join(graph.last_run["computed"]) or "-")
+    metrics.CACHE_REQUESTS.inc(len(graph.last_run["reused"]), cache="analysis_stage", result="hit")
+    metrics.CACHE_REQUESTS.inc(len(graph.last_run["computed"]), cache="analysis_stage", result="miss")
+    return result
+
+# Design studies over the loads of a completed analysis (material independent, so only the cheap solve repeats)
+BLENDED_PROPERTIES = ("density", "youngs_modulus", "poisson_ratio", "yield_strength", "ultimate_strength", "cost_per_kg")
+
+def part_mass_from_volume(volume, density, thickness_scale=1.0):
+    """Packaging part mass (kg) for a wall density and thickness scale (broadcasts over arrays)"""
+    if volume is None:
+        # No analysed geometry: keep the reference mass assumption
+        return REFERENCE_PACKAGE_MASS_KG * np.asarray(thickness_scale) * np.ones_like(np.asarray(density, dtype=np.float64))
+    # Thin walls: volume grows linearly with wall thickness
+    return volume * np.asarray(density) * np.asarray(thickness_scale)
+
+def blend_material_properties(base_props, partner_props, fraction):
+    """Rule-of-mixtures properties of a blend with `fraction` of the partner (broadcasts over arrays)"""
+    fraction = np.asarray(fraction, dtype=np.float64)
+    blended = {prop: (1 - fraction) * base_props[prop] + fraction * partner_props[prop] for prop in BLENDED_PROPERTIES}
+    blended["corrugated"] = base_props.get("corrugated", False)
+    return blended
+
+def optimize_material_design(library, material, case_loads, volume, payload_kg=0.0, objective="cost",
+                             thickness_bounds=(0.5, 3.0), min_safety=2.05, blend_partners=6, warm_starts=None,
+                             screen_points=fea_utils.OPTIMIZER_SCREEN_POINTS):
+    """Cheapest (or lightest) wall thickness and material blend with SF >= min_safety in every load case
+
+    case_loads maps each configured test type to its loads stage value.
+    warm_starts (a dict kept by the caller) carries the previous optimum
+    per base material, partner and objective into the next search.
+    """
+    base_props = library[material]
+    warm_starts = {} if warm_starts is None else warm_starts
+
+    case_thickness = {}
+    for test_type, loads in case_loads.items():
+        thickness = None
+        if test_type == "stacking":
+            thickness = loads["thickness"] or DEFAULT_WALL_THICKNESS.get(material, DEFAULT_PLASTIC_WALL_THICKNESS)
+        case_thickness[test_type] = thickness
+
+    def evaluate_candidates(partner_props):
+        def evaluate(designs):
+            thickness_scale, fraction = designs[:, 0], designs[:, 1]
+            props = blend_material_properties(base_props, partner_props, fraction)
+            part_mass = part_mass_from_volume(volume, props["density"], thickness_scale)
+            safety = np.full(len(designs), np.inf)
+            for test_type, loads in case_loads.items():
+                solution = solve_load_case(test_type, loads, props, part_mass + payload_kg,
+                                           wall_thickness=case_thickness[test_type], thickness_scale=thickness_scale)
+                safety = np.minimum(safety, solution["safety_factor"])
+            value = part_mass * props["cost_per_kg"] if objective == "cost" else part_mass
+            return value, safety
+        return evaluate
+
+    # Blend partners: the base itself (thickness only) plus the library grades of the same
+    # class with the best strength per cost
+    same_class = [key for key in library.query(corrugated=base_props.get("corrugated", False))
+                  if not key.startswith("DesignEdge_") and key != material]
+    partners = [material] + library.rank("strength_per_cost", same_class, top=blend_partners)
+
+    def design_rank(result):
+        # Feasible designs by objective, otherwise the one closest to the safety target
+        return (result["feasible"], -result["objective"] if result["feasible"] else result["min_safety"])
+
+    best = None
+    for partner in partners:
+        fraction_bounds = (0.0, 0.0) if partner == material else (0.0, 1.0)
+        warm_key = (material, partner, objective)
+        result = fea_utils.optimize_design(
+            evaluate_candidates(library[partner]),
+            [thickness_bounds, fraction_bounds],
+            min_safety=min_safety,
+            x0=warm_starts.get(warm_key),
+            screen_points=screen_points
+        )
+        warm_starts[warm_key] = result["x"]
+        result["partner"] = partner
+        if best is None or design_rank(result) > design_rank(best):
+            best = result
+
+    thickness_scale, fraction = (float(value) for value in best["x"])
+    partner = best["partner"]
+    props = {prop: float(value) for prop, value in
+             blend_material_properties(base_props, library[partner], fraction).items()}
+    part_mass = float(part_mass_from_volume(volume, props["density"], thickness_scale))
+
+    safety_factors = {}
+    for test_type, loads in case_loads.items():
+        solution = solve_load_case(test_type, loads, props, part_mass + payload_kg,
+                                   wall_thickness=case_thickness[test_type], thickness_scale=thickness_scale)
+        safety_factors[test_type] = float(solution["safety_factor"])
+
+    if partner == material or fraction < 0.005:
+        name = f"DesignEdge Optimized {base_props['name']}"
+        description = f"{base_props['name']} with wall thickness x{thickness_scale:.2f}"
+    else:
+        name = f"DesignEdge {material}/{partner} Blend"
+        description = (f"{(1 - fraction) * 100:.0f}% {base_props['name']} / {fraction * 100:.0f}% "
+                       f"{library[partner]['name']} with wall thickness x{thickness_scale:.2f}")
+
+    props.update({"name": name, "description": description})
+    return {
+        "properties": props,
+        "partner": partner,
+        "blend_fraction": fraction,
+        "thickness_scale": thickness_scale,
+        "part_mass_kg": part_mass,
+        "part_cost": part_mass * props["cost_per_kg"],
+        "safety_factors": safety_factors,
+        "min_safety": best["min_safety"],
+        "feasible": best["feasible"],
+        "evaluations": best["evaluations"],
+        "objective": objective
+    }
+
+def rank_materials(library, case_loads, volume, payload_kg=0.0, thickness_scale=1.0):
+    """Safety factors, part mass and cost of every library grade, solved as one vectorized batch
+
+    case_loads maps each configured test type to its loads stage value.
+    Passing designs come first, then by part cost.
+    """
+    keys = library.query()
+    columns = {column: library.column(column) for column in material_library.NUMERIC_COLUMNS}
+    corrugated = library.column("corrugated")
+
+    part_mass = part_mass_from_volume(volume, columns["density"], thickness_scale)
+    package_mass = part_mass + payload_kg
+
+    table = {"material": keys, "name": library.column("name")}
+    min_safety = np.full(len(keys), np.inf)
+    for test_type, loads in case_loads.items():
+        safety = np.empty(len(keys))
+        for flag in (False, True):
+            rows = corrugated == flag
+            if not rows.any():
+                continue
+            props = {column: values[rows] for column, values in columns.items()}
+            props["corrugated"] = flag
+            thickness = None
+            if test_type == "stacking":
+                thickness = loads["thickness"] or (DEFAULT_WALL_THICKNESS["Cardboard"] if flag
+                                                   else DEFAULT_PLASTIC_WALL_THICKNESS)
+            safety[rows] = solve_load_case(test_type, loads, props, package_mass[rows],
+                                           wall_thickness=thickness, thickness_scale=thickness_scale)["safety_factor"]
+
+        table[f"sf_{test_type}"] = safety
+        min_safety = np.minimum(min_safety, safety)
+
+    table.update({
+        "min_safety_factor": min_safety,
+        "part_mass_kg": part_mass,
+        "part_cost": part_mass * columns["cost_per_kg"],
+        "compliance": np.where(min_safety > 2.0, "PASS", "FAIL")
+    })
+
+    ranking = pd.DataFrame(table)
+    ranking = ranking.sort_values(["compliance", "part_cost", "min_safety_factor"],
+                                  ascending=[False, True, False], kind="stable").reset_index(drop=True)
+    ranking.insert(0, "rank", np.arange(1, len(ranking) + 1))
+    return ranking
+
+# One graph per worker process: consecutive jobs on the same design reuse its cached stages
+_worker_graph = None
+
+def load_case_job(payload, context):
+    """Job queue entry point: evaluate one load case in a worker process"""
+    global _worker_graph
+    if _worker_graph is None:
+        _worker_graph = build_analysis_graph()
+
+    inputs = payload["inputs"]
+    test_type = inputs["test_type"]
+
+    if payload.get("profile"):
+        # Requested from the admin tools: artifacts are named after the job id
+        with profiling.profile(context.job_id, test_type=test_type):
+            return _evaluate_load_case(inputs, test_type, context)
+    return _evaluate_load_case(inputs, test_type, context)
+
+def _evaluate_load_case(inputs, test_type, context):
+    context.progress(0.1, "Computing loads")
+    _worker_graph.evaluate("loads", inputs, scope=test_type)
+
+    context.progress(0.7, "Solving stresses and safety factors")
+    return dict(_worker_graph.evaluate("post", inputs, scope=test_type))
@@ -0,0 +1,283 @@
+# DesignEdge.AI - Material library
+#
+# Columnar store of packaging material grades loaded from CSV or Parquet. Each
+# numeric property is one contiguous numpy column with a lazily built sorted
+# index, so range screening and merit indices run over thousands of grades
+# without Python loops. The library is a mapping of material key -> property
+# dict, the same shape as the original MATERIAL_PROPERTIES table, so existing
+# callers keep working and new grades can be registered at runtime.
+
+import os
+from collections.abc import MutableMapping
+
+import numpy as np
+import pandas as pd
+
+MATERIALS_FILE = os.getenv("DESIGNEDGE_MATERIALS_FILE", "materials.csv")
+
+NUMERIC_COLUMNS = ("density", "youngs_modulus", "poisson_ratio", "yield_strength", "ultimate_strength", "cost_per_kg",
+                   "edge_crush")
+OPTIONAL_COLUMNS = ("edge_crush",)   # NaN when not given (edge crush resistance, N/m, of corrugated grades)
+TEXT_COLUMNS = ("name", "description")
+FLAG_COLUMNS = ("corrugated",)
+
+# Material indices for lightweight design (higher is better): label, description
+MERIT_INDICES = {
+    "strength_per_density": ("σy/ρ", "Strength-limited tie or wall in tension"),
+    "panel_stiffness": ("E^(1/3)/ρ", "Stiffness-limited panel of minimum mass"),
+    "panel_strength": ("σy^(1/2)/ρ", "Strength-limited panel in bending of minimum mass"),
+    "strength_per_cost": ("σy/(ρ·C)", "Strength per unit material cost"),
+}
+
+# Built-in grades, always present (aluminum removed, PP updated from xlsx)
+BUILTIN_MATERIALS = {
+    "HDPE": {
+        "name": "High-Density Polyethylene",
+        "density": 960,
+        "youngs_modulus": 1200e6,
+        "poisson_ratio": 0.42,
+        "yield_strength": 26e6,
+        "ultimate_strength": 34e6,
+        "cost_per_kg": 1.5,
+        "description": "Excellent chemical resistance and impact strength for rigid packaging applications"
+    },
+    "PP": {
+        "name": "Polypropylene",
+        "density": 1200,  # Updated from xlsx: 1.2e-06 g/cm³ = 1200 kg/m³
+        "youngs_modulus": 2e9,  # Updated from xlsx: 2 GPa
+        "poisson_ratio": 0.4,   # Updated from xlsx
+        "yield_strength": 30e6,
+        "ultimate_strength": 38e6,
+        "cost_per_kg": 1.2,
+        "description": "Superior fatigue resistance with excellent chemical compatibility"
+    },
+    "PET": {
+        "name": "Polyethylene Terephthalate",
+        "density": 1340,  # Updated from xlsx: 1.34e-06 g/cm³ = 1340 kg/m³
+        "youngs_modulus": 3e9,  # Updated from xlsx: 3 GPa
+        "poisson_ratio": 0.4,   # Updated from xlsx
+        "yield_strength": 55e6,
+        "ultimate_strength": 75e6,
+        "cost_per_kg": 2.1,
+        "description": "High-performance thermoplastic with exceptional clarity and barrier properties"
+    },
+    "Cardboard": {
+        "name": "Corrugated Cardboard",
+        "density": 700,
+        "youngs_modulus": 0.25e9,  # E11 from xlsx: 0.25 GPa
+        "poisson_ratio": 0.30,
+        "yield_strength": 12e6,
+        "ultimate_strength": 18e6,
+        "cost_per_kg": 0.8,
+        "edge_crush": 5.6e3,  # 32 ECT single wall C-flute
+        "corrugated": True,
+        "description": "Sustainable fiber-based material optimized for lightweight protection"
+    }
+}
+
+
+def merit_index(name, columns):
+    """Vectorized merit index over property columns (any mapping of column -> array)"""
+    density = np.asarray(columns["density"], dtype=np.float64)
+    if name == "strength_per_density":
+        return np.asarray(columns["yield_strength"]) / density
+    if name == "panel_stiffness":
+        return np.cbrt(np.asarray(columns["youngs_modulus"])) / density
+    if name == "panel_strength":
+        return np.sqrt(np.asarray(columns["yield_strength"])) / density
+    if name == "strength_per_cost":
+        return np.asarray(columns["yield_strength"]) / (density * np.asarray(columns["cost_per_kg"]))
+    raise ValueError(f"Unknown merit index: {name}")
+
+
+def read_material_table(path):
+    """Read a CSV or Parquet material table into a DataFrame indexed by material key"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        try:
+            frame = pd.read_parquet(path)
+        except ImportError as e:
+            raise ValueError(f"Parquet material tables need pyarrow or fastparquet: {str(e)}")
+    else:
+        frame = pd.read_csv(path)
+    return normalize_material_table(frame)
+
+
+def normalize_material_table(frame):
+    """Validate columns, fill optional ones and index the table by material key"""
+    frame = frame.rename(columns=lambda column: str(column).strip().lower())
+    if "key" not in frame.columns:
+        raise ValueError("Material table needs a 'key' column")
+
+    missing = [column for column in NUMERIC_COLUMNS
+               if column not in frame.columns and column != "ultimate_strength" and column not in OPTIONAL_COLUMNS]
+    if missing:
+        raise ValueError(f"Material table is missing columns: {', '.join(missing)}")
+
+    frame = frame.copy()
+    frame["key"] = frame["key"].astype(str).str.strip()
+    if "ultimate_strength" not in frame.columns:
+        frame["ultimate_strength"] = frame["yield_strength"]
+    frame["ultimate_strength"] = frame["ultimate_strength"].fillna(frame["yield_strength"])
+    if "name" not in frame.columns:
+        frame["name"] = frame["key"]
+    if "description" not in frame.columns:
+        frame["description"] = ""
+    if "corrugated" not in frame.columns:
+        frame["corrugated"] = False
+    for column in OPTIONAL_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = np.nan
+
+    frame["name"] = frame["name"].fillna(frame["key"]).astype(str)
+    frame["description"] = frame["description"].fillna("").astype(str)
+    frame["corrugated"] = frame["corrugated"].fillna(False).astype(str).str.lower().isin(["true", "1", "yes"])
+    for column in NUMERIC_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="raise").astype(np.float64)
+
+    frame = frame.drop_duplicates("key", keep="last").set_index("key")
+    return frame[list(TEXT_COLUMNS) + list(NUMERIC_COLUMNS) + list(FLAG_COLUMNS)]
+
+
+class MaterialLibrary(MutableMapping):
+    """Material grades held column-wise, addressable like a dict of property dicts"""
+
+    def __init__(self, frame=None):
+        self._keys = np.empty(0, dtype=object)
+        self._columns = {column: np.empty(0, dtype=np.float64) for column in NUMERIC_COLUMNS}
+        self._columns.update({column: np.empty(0, dtype=object) for column in TEXT_COLUMNS})
+        self._columns.update({column: np.empty(0, dtype=bool) for column in FLAG_COLUMNS})
+        self._rows = {}
+        self._sorted = {}
+        self.version = 0     # Incremented on every change, for caches keyed on the library contents
+        if frame is not None:
+            self.register_table(frame)
+
+    @classmethod
+    def from_records(cls, records):
+        """Library from a {key: property dict} mapping"""
+        frame = pd.DataFrame.from_dict(records, orient="index")
+        frame.insert(0, "key", frame.index)
+        return cls(normalize_material_table(frame.reset_index(drop=True)))
+
+    def load(self, path):
+        """Register every grade of a CSV or Parquet table (existing keys are replaced)"""
+        self.register_table(read_material_table(path))
+        return self
+
+    def register_table(self, frame):
+        """Register a normalized table; grades with existing keys are updated in place"""
+        keys = frame.index.to_numpy(dtype=object)
+        existing = np.array([key in self._rows for key in keys], dtype=bool)
+
+        if existing.any():
+            rows = np.array([self._rows[key] for key in keys[existing]])
+            for column in self._columns:
+                self._columns[column][rows] = frame[column].to_numpy()[existing]
+
+        new = ~existing
+        if new.any():
+            start = len(self._keys)
+            self._keys = np.concatenate([self._keys, keys[new]])
+            for column in self._columns:
+                self._columns[column] = np.concatenate(
+                    [self._columns[column], frame[column].to_numpy().astype(self._columns[column].dtype)[new]])
+            self._rows.update({key: start + i for i, key in enumerate(keys[new])})
+
+        self._sorted.clear()
+        self.version += 1
+
+    def copy(self):
+        """Independent copy (columns are copied, so registrations do not leak back)"""
+        library = MaterialLibrary()
+        library._keys = self._keys.copy()
+        library._columns = {column: values.copy() for column, values in self._columns.items()}
+        library._rows = dict(self._rows)
+        library.version = self.version
+        return library
+
+    def __getitem__(self, key):
+        row = self._rows[key]
+        props = {column: float(self._columns[column][row]) for column in NUMERIC_COLUMNS}
+        props.update({column: str(self._columns[column][row]) for column in TEXT_COLUMNS})
+        props.update({column: bool(self._columns[column][row]) for column in FLAG_COLUMNS})
+        return props
+
+    def __setitem__(self, key, props):
+        record = {"key": key}
+        record.update({column: props[column] for column in props if column in self._columns})
+        self.register_table(normalize_material_table(pd.DataFrame([record])))
+
+    def __delitem__(self, key):
+        row = self._rows.pop(key)
+        keep = np.arange(len(self._keys)) != row
+        self._keys = self._keys[keep]
+        self._columns = {column: values[keep] for column, values in self._columns.items()}
+        self._rows = {key: i for i, key in enumerate(self._keys)}
+        self._sorted.clear()
+        self.version += 1
+
+    def __iter__(self):
+        return iter(self._keys.tolist())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def column(self, name, keys=None):
+        """Values of one column for all grades or for the given keys"""
+        values = self._columns[name]
+        if keys is None:
+            return values
+        return values[[self._rows[key] for key in keys]]
+
+    def _sorted_index(self, column):
+        if column not in self._sorted:
+            order = np.argsort(self._columns[column], kind="stable")
+            self._sorted[column] = (order, self._columns[column][order])
+        return self._sorted[column]
+
+    def query(self, **conditions):
+        """Keys of the grades matching every condition
+
+        A (low, high) tuple is an inclusive range on a numeric column (None
+        leaves that side open) and is answered with a binary search on the
+        column's sorted index; any other value must equal the column value.
+        """
+        selected = np.ones(len(self._keys), dtype=bool)
+        for column, condition in conditions.items():
+            if isinstance(condition, tuple):
+                low, high = condition
+                order, values = self._sorted_index(column)
+                start = 0 if low is None else np.searchsorted(values, low, side="left")
+                stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+                in_range = np.zeros(len(self._keys), dtype=bool)
+                in_range[order[start:stop]] = True
+                selected &= in_range
+            else:
+                selected &= self._columns[column] == condition
+        return self._keys[selected].tolist()
+
+    def merit(self, name, keys=None):
+        """Merit index of all grades (or the given keys)"""
+        if keys is None:
+            return merit_index(name, self._columns)
+        rows = [self._rows[key] for key in keys]
+        return merit_index(name, {column: self._columns[column][rows] for column in NUMERIC_COLUMNS})
+
+    def rank(self, name, keys=None, top=None):
+        """Keys ordered by descending merit index"""
+        keys = list(self._keys) if keys is None else list(keys)
+        order = np.argsort(-self.merit(name, keys), kind="stable")
+        if top is not None:
+            order = order[:top]
+        return [keys[i] for i in order]
+
+    def to_frame(self, keys=None):
+        """DataFrame view of the library (all grades or the given keys)"""
+        rows = np.arange(len(self._keys)) if keys is None else np.array([self._rows[key] for key in keys], dtype=int)
+        frame = pd.DataFrame({column: values[rows] for column, values in self._columns.items()})
+        frame.insert(0, "key", self._keys[rows])
+        return frame
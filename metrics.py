@@ -0,0 +1,325 @@
+# DesignEdge.AI - Production metrics
+#
+# Process-wide counters, gauges and histograms in the Prometheus text
+# exposition format, served on a local port (GET /metrics) for scraping, and
+# structured JSON log lines written to the logs volume for offline capacity
+# planning. Gauges that describe shared state (e.g. job queue depth) are
+# refreshed by collector callbacks at scrape time. Dependency-free so it can
+# be imported by the app and by worker processes alike.
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import threading
+import contextlib
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = os.getenv("DESIGNEDGE_METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("DESIGNEDGE_METRICS_PORT", "9108"))
+LOG_DIR = os.getenv("DESIGNEDGE_LOG_DIR", "logs")
+LOG_MAX_BYTES = 20 * 1024 * 1024     # Rotate the JSON event log at 20 MB
+LOG_BACKUPS = 5
+SESSION_IDLE_SECONDS = 300           # Sessions without a script run for this long no longer count as active
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+MEMORY_BUCKETS = tuple(2 ** power for power in range(16, 32, 2))   # 64 KiB .. 1 GiB
+
+_lock = threading.Lock()
+_registry = {}
+_collectors = []
+_sessions = {}
+_server = None
+_event_logger = None
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        with _lock:
+            if name in _registry:
+                raise ValueError(f"Duplicate metric: {name}")
+            _registry[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+
+    def clear(self):
+        with _lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', _format_value(bound))])} {count_in}"
+            for bound, count_in in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+ANALYSIS_SECONDS = Histogram("designedge_analysis_seconds",
+                             "Load-case analysis execution time in the worker", ["test_type"])
+ANALYSIS_WAIT_SECONDS = Histogram("designedge_analysis_queue_wait_seconds",
+                                  "Time analysis jobs waited in the queue before a worker started them", ["test_type"])
+ANALYSIS_JOBS = Counter("designedge_analysis_jobs_total", "Finished analysis jobs", ["test_type", "status"])
+CACHE_REQUESTS = Counter("designedge_cache_requests_total", "Cache lookups by cache and outcome", ["cache", "result"])
+LLM_SECONDS = Histogram("designedge_llm_request_seconds", "LLM request latency", ["model"])
+LLM_REQUESTS = Counter("designedge_llm_requests_total", "LLM requests by outcome", ["model", "outcome"])
+ACTIVE_SESSIONS = Gauge("designedge_active_sessions",
+                        f"Sessions with a script run in the last {SESSION_IDLE_SECONDS} s")
+SESSION_MEMORY = Histogram("designedge_session_state_bytes", "Estimated session state size per script run",
+                           buckets=MEMORY_BUCKETS)
+PROCESS_MEMORY = Gauge("designedge_process_resident_bytes", "Resident memory of the app process")
+QUEUE_DEPTH = Gauge("designedge_job_queue_jobs", "Jobs in the shared job queue by status", ["status"])
+
+
+def register_collector(callback):
+    """Call `callback()` before every scrape to refresh gauges of shared state"""
+    with _lock:
+        _collectors.append(callback)
+
+
+def _collect_process():
+    with _lock:
+        cutoff = time.time() - SESSION_IDLE_SECONDS
+        for session_id in [session_id for session_id, seen in _sessions.items() if seen < cutoff]:
+            del _sessions[session_id]
+        active = len(_sessions)
+    ACTIVE_SESSIONS.set(active)
+    resident = resident_memory()
+    if resident is not None:
+        PROCESS_MEMORY.set(resident)
+
+
+def resident_memory():
+    """Resident set size of this process in bytes (None where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        collectors = list(_collectors)
+    for callback in [_collect_process] + collectors:
+        try:
+            callback()
+        except Exception as e:
+            # A failing collector (e.g. a locked queue database) must not break the scrape
+            log_event("collector_failed", collector=getattr(callback, "__name__", repr(callback)), error=str(e))
+    with _lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def touch_session(session_id):
+    """Mark a session as active (called once per script run)"""
+    with _lock:
+        _sessions[session_id] = time.time()
+
+
+def estimate_size(value, _depth=0):
+    """Approximate memory held by a session value: array/frame buffers plus container overhead"""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage) and hasattr(value, "columns"):
+        try:
+            return int(memory_usage(deep=True).sum())
+        except (TypeError, ValueError):
+            pass
+    size = sys.getsizeof(value, 0)
+    if _depth >= 6:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    return size
+
+
+@contextlib.contextmanager
+def track_llm(model):
+    """Time an LLM request and count its outcome (the exception, if any, propagates)"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        elapsed = time.perf_counter() - started
+        LLM_SECONDS.observe(elapsed, model=model)
+        LLM_REQUESTS.inc(model=model, outcome="error")
+        log_event("llm_request", model=model, seconds=elapsed, outcome="error", error=type(e).__name__)
+        raise
+    elapsed = time.perf_counter() - started
+    LLM_SECONDS.observe(elapsed, model=model)
+    LLM_REQUESTS.inc(model=model, outcome="ok")
+    log_event("llm_request", model=model, seconds=elapsed, outcome="ok")
+
+
+def observe_job(test_type, status):
+    """Record a finished analysis job from its queue status record"""
+    ANALYSIS_JOBS.inc(test_type=test_type, status=status["status"])
+    fields = {"test_type": test_type, "job": status["id"], "status": status["status"]}
+    if status.get("started") is not None:
+        wait = status["started"] - status["created"]
+        ANALYSIS_WAIT_SECONDS.observe(wait, test_type=test_type)
+        fields["queue_wait_seconds"] = wait
+        if status.get("finished") is not None:
+            seconds = status["finished"] - status["started"]
+            ANALYSIS_SECONDS.observe(seconds, test_type=test_type)
+            fields["seconds"] = seconds
+    log_event("analysis_job", **fields)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": record.created, "host": socket.gethostname(), "pid": record.process,
+                 "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+def _get_event_logger():
+    global _event_logger
+    with _lock:
+        if _event_logger is None:
+            logger = logging.getLogger("designedge.events")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            try:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                # One file per host: replicas share the logs volume
+                handler = RotatingFileHandler(os.path.join(LOG_DIR, f"events-{socket.gethostname()}.jsonl"),
+                                              maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+            except OSError:
+                handler = logging.NullHandler()
+            handler.setFormatter(_JsonFormatter())
+            logger.addHandler(handler)
+            _event_logger = logger
+    return _event_logger
+
+
+def log_event(event, **fields):
+    """Append one structured JSON line to the event log"""
+    _get_event_logger().info(event, extra={"fields": fields})
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET /metrics for Prometheus scrapes"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Start the metrics endpoint in a daemon thread (once per process)"""
+    global _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            except OSError:
+                # Port already bound by another app process on this host
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
@@ -0,0 +1,117 @@
+# DesignEdge.AI - On-demand profiling
+#
+# Wraps a block (typically one analysis job in a worker process) in cProfile
+# and tracemalloc and writes the results to the logs volume: a .prof file for
+# pstats / snakeviz and a .json summary with the top functions by self time
+# and the top allocation sites, which the app renders for admins. Both
+# profilers slow the profiled code down considerably, so they only run when
+# explicitly requested.
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+import contextlib
+
+PROFILE_DIR = os.path.join(os.getenv("DESIGNEDGE_LOG_DIR", "logs"), "profiles")
+PROFILE_TOP_N = 25         # Functions and allocation sites kept in the summary
+TRACEMALLOC_FRAMES = 10    # Stack depth recorded per allocation
+
+# Allocation sites inside the profilers themselves
+_IGNORED_ALLOCATIONS = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def artifact_paths(name, directory=PROFILE_DIR):
+    """(.prof, .json) paths of a profile"""
+    return os.path.join(directory, f"{name}.prof"), os.path.join(directory, f"{name}.json")
+
+
+def hotspots(profiler, top=PROFILE_TOP_N):
+    """Functions with the most self time: call counts, self and cumulative seconds"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (primitive_calls, calls, self_time, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": function,
+            "location": f"{os.path.basename(filename)}:{line}" if line else "built-in",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "self_s": self_time,
+            "cumulative_s": cumulative,
+        })
+    rows.sort(key=lambda row: row["self_s"], reverse=True)
+    return rows[:top]
+
+
+def allocation_sites(snapshot, top=PROFILE_TOP_N):
+    """Source lines holding the most memory still allocated at the end of the block"""
+    statistics = snapshot.filter_traces(_IGNORED_ALLOCATIONS).statistics("lineno")
+    return [{
+        "location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+        "size_bytes": stat.size,
+        "blocks": stat.count,
+    } for stat in statistics[:top]]
+
+
+@contextlib.contextmanager
+def profile(name, directory=PROFILE_DIR, top=PROFILE_TOP_N, **attrs):
+    """Profile the enclosed block and write <name>.prof and <name>.json to `directory`
+
+    Yields the summary dict, which is filled in when the block exits (also when
+    it raises, recording the exception).
+    """
+    summary = {"name": name, "attrs": attrs}
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    started = time.time()
+    profiler.enable()
+    try:
+        yield summary
+    except BaseException as e:
+        summary["exception"] = type(e).__name__
+        raise
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+
+        prof_path, json_path = artifact_paths(name, directory)
+        summary.update({
+            "started": started,
+            "wall_s": time.time() - started,
+            "peak_bytes": peak,
+            "hotspots": hotspots(profiler, top),
+            "allocations": allocation_sites(snapshot, top),
+            "prof_file": prof_path,
+        })
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(prof_path)
+            with open(json_path, "w") as f:
+                json.dump(summary, f, indent=2, default=str)
+        except OSError as e:
+            # Profiling must never fail the profiled work
+            summary["write_error"] = str(e)
+
+
+def load_summary(name, directory=PROFILE_DIR):
+    """Summary written by profile() (None if the profile does not exist yet)"""
+    _, json_path = artifact_paths(name, directory)
+    try:
+        with open(json_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
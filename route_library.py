@@ -0,0 +1,266 @@
+# DesignEdge.AI - Route profile library
+#
+# Named transport routes built from road-class segments, optionally with an
+# elevation profile: the four generic route types plus the lanes of the local
+# routes file. Every route has a statistical signature (g distribution,
+# rainflow cycle matrix, route PSD, shock count) computed once from a seeded
+# simulation and stored under data/routes, so analyses of common routes are a
+# lookup. Distance-proportional statistics scale with route length; custom
+# routes are composed segment by segment from the per-road-class signatures.
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+import fatigue
+
+ROUTES_FILE = os.getenv("DESIGNEDGE_ROUTES_FILE", "routes.json")
+SIGNATURE_DIR = os.path.join(os.getenv("DESIGNEDGE_DATA_DIR", "data"), "routes")
+SIGNATURE_VERSION = 1               # Bump when the simulation or signature contents change
+SIGNATURE_SEED = 20240601           # Seed of the simulations behind the signatures
+SIGNATURE_MIN_KM = 2000             # Generic routes and road classes are simulated over this distance
+SHOCK_G = 2.5                       # Upward crossings of this level count as shocks
+G_HISTOGRAM_EDGES = np.linspace(0.0, 5.0, 101)
+
+CUSTOM_ROUTE = "Custom (segments)"
+
+# Speed and event model per road class: "stop_and_go" adds traffic lights and
+# rush hour, "cruise" adds congestion and weather slow-downs; roughness scales
+# the road surface excitation
+ROAD_CLASSES = {
+    "city": {"model": "stop_and_go", "base_speed": 45, "speed_variation": 25, "roughness": 1.0},
+    "highway": {"model": "cruise", "base_speed": 85, "speed_variation": 15, "roughness": 1.0},
+    "rural": {"model": "cruise", "base_speed": 55, "speed_variation": 25, "roughness": 1.5},
+    "mountain": {"model": "cruise", "base_speed": 50, "speed_variation": 20, "roughness": 1.2},
+    "offroad": {"model": "stop_and_go", "base_speed": 25, "speed_variation": 35, "roughness": 2.5},
+}
+
+# Generic route types: a stop-and-go share followed by cruising, as fractions of the distance
+BUILTIN_ROUTES = {
+    "Mixed (City + Highway)": {
+        "region": "Generic",
+        "description": "Urban start followed by motorway driving",
+        "segments": [
+            {"road_class": "city", "fraction": 0.35, "base_speed": 45, "speed_variation": 25},
+            {"road_class": "highway", "fraction": 0.65, "base_speed": 85, "speed_variation": 15},
+        ],
+    },
+    "Primarily City": {
+        "region": "Generic",
+        "description": "Mostly urban stop-and-go driving",
+        "segments": [
+            {"road_class": "city", "fraction": 0.80, "base_speed": 35, "speed_variation": 30},
+            {"road_class": "highway", "fraction": 0.20, "base_speed": 65, "speed_variation": 10},
+        ],
+    },
+    "Primarily Highway": {
+        "region": "Generic",
+        "description": "Long-haul motorway driving",
+        "segments": [
+            {"road_class": "city", "fraction": 0.15, "base_speed": 50, "speed_variation": 20},
+            {"road_class": "highway", "fraction": 0.85, "base_speed": 90, "speed_variation": 20},
+        ],
+    },
+    "Off-road/Rural": {
+        "region": "Generic",
+        "description": "Slow rural roads and tracks",
+        "segments": [
+            {"road_class": "city", "fraction": 0.60, "base_speed": 25, "speed_variation": 35},
+            {"road_class": "highway", "fraction": 0.40, "base_speed": 55, "speed_variation": 25},
+        ],
+    },
+}
+
+_memory_cache = {}
+_routes_cache = {}
+
+
+def load_routes(path=ROUTES_FILE):
+    """Built-in route types plus the lanes of the routes file (file entries replace built-ins)"""
+    routes = {name: dict(profile, name=name) for name, profile in BUILTIN_ROUTES.items()}
+    if path and os.path.isfile(path):
+        with open(path) as f:
+            for name, profile in json.load(f).items():
+                routes[name] = validate_route(dict(profile, name=name))
+    return routes
+
+
+def get_routes(path=ROUTES_FILE):
+    """Route profiles by name, reloaded when the routes file changes"""
+    modified = os.path.getmtime(path) if path and os.path.isfile(path) else None
+    cached = _routes_cache.get(path)
+    if cached is None or cached[0] != modified:
+        cached = _routes_cache[path] = (modified, load_routes(path))
+    return cached[1]
+
+
+def resolve_route(route, segments=None):
+    """Route profile from a profile dict, a route name, or CUSTOM_ROUTE with (road class, length km) segments"""
+    if isinstance(route, dict):
+        return route
+    if route == CUSTOM_ROUTE:
+        return custom_route(segments or [])
+    routes = get_routes()
+    # Unknown names fall back to the default route type, as the original route table did
+    return routes.get(route, routes["Mixed (City + Highway)"])
+
+
+def validate_route(profile):
+    """Check road classes and segment sizes of a route profile"""
+    segments = profile.get("segments") or []
+    if not segments:
+        raise ValueError(f"Route {profile.get('name')} has no segments")
+    for segment in segments:
+        if segment.get("road_class") not in ROAD_CLASSES:
+            raise ValueError(f"Route {profile.get('name')}: unknown road class {segment.get('road_class')}")
+        if segment.get("length_km", segment.get("fraction", 0)) <= 0:
+            raise ValueError(f"Route {profile.get('name')}: segments need a positive length_km or fraction")
+    return profile
+
+
+def custom_route(segments):
+    """Route profile from (road class, length km) pairs"""
+    return validate_route({
+        "name": CUSTOM_ROUTE,
+        "region": "Custom",
+        "segments": [{"road_class": road_class, "length_km": float(length_km)} for road_class, length_km in segments],
+    })
+
+
+def route_length(profile):
+    """Length of a route with absolute segment lengths (None for fraction-based route types)"""
+    if all("length_km" in segment for segment in profile["segments"]):
+        return float(sum(segment["length_km"] for segment in profile["segments"]))
+    return None
+
+
+def segment_plan(profile):
+    """Per segment: road class parameters and (start, end) as fractions of the route"""
+    sizes = np.array([segment.get("length_km", segment.get("fraction", 0.0)) for segment in profile["segments"]],
+                     dtype=np.float64)
+    bounds = np.concatenate(([0.0], np.cumsum(sizes) / sizes.sum()))
+    plan = []
+    for segment, start, end in zip(profile["segments"], bounds[:-1], bounds[1:]):
+        params = dict(ROAD_CLASSES[segment["road_class"]])
+        params.update({key: value for key, value in segment.items() if key in params})
+        params["road_class"] = segment["road_class"]
+        plan.append((params, float(start), float(end)))
+    return plan
+
+
+def signature_key(profile, distance_km):
+    """Content hash of everything a stored signature depends on"""
+    relevant = {key: profile.get(key) for key in ("segments", "elevation_profile")}
+    payload = json.dumps([SIGNATURE_VERSION, SIGNATURE_SEED, distance_km, ROAD_CLASSES, relevant], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+def save_signature(key, signature, root=SIGNATURE_DIR):
+    """Store a signature as one .npz file (arrays plus JSON scalars), written atomically"""
+    os.makedirs(root, exist_ok=True)
+    arrays = {name: np.asarray(value) for name, value in signature.items() if isinstance(value, np.ndarray)}
+    scalars = {name: value for name, value in signature.items() if name not in arrays}
+    path = os.path.join(root, f"{key}.npz")
+    staging = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(staging, _meta=np.array(json.dumps(scalars)), **arrays)
+    os.replace(staging, path)
+
+
+def load_signature(key, root=SIGNATURE_DIR):
+    """Stored signature, or None"""
+    path = os.path.join(root, f"{key}.npz")
+    if not os.path.isfile(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        signature = json.loads(str(data["_meta"]))
+        signature.update({name: data[name] for name in data.files if name != "_meta"})
+    return signature
+
+
+def cached_signature(profile, distance_km, compute):
+    """Signature of a route simulated over `distance_km`: memory, then disk, then compute(profile, distance_km)"""
+    key = signature_key(profile, distance_km)
+    signature = _memory_cache.get(key)
+    if signature is None:
+        signature = load_signature(key)
+        if signature is None:
+            signature = compute(profile, distance_km)
+            try:
+                save_signature(key, signature)
+            except OSError:
+                # Read-only data directory: keep the signature for this process only
+                pass
+        _memory_cache[key] = signature
+    return signature
+
+
+def compose_signatures(parts):
+    """Signature of a route made of (signature, length km) parts
+
+    Counts (samples, histogram, cycles, shocks) and travel time add up in
+    proportion to each part's length; the PSD is averaged over travel time.
+    All parts need the same PSD frequency grid (signatures simulated over
+    SIGNATURE_MIN_KM or more always share it).
+    """
+    weights = [length_km / signature["distance_km"] for signature, length_km in parts]
+    signatures = [signature for signature, _ in parts]
+    hours = [signature["hours"] * weight for signature, weight in zip(signatures, weights)]
+    total_hours = sum(hours)
+
+    cycles = fatigue.merge_cycles([cycle_matrix(signature) for signature in signatures], weights)
+
+    return {
+        "distance_km": float(sum(length_km for _, length_km in parts)),
+        "hours": total_hours,
+        "samples": float(sum(s["samples"] * w for s, w in zip(signatures, weights))),
+        "max_g": max(s["max_g"] for s in signatures),
+        "shocks": float(sum(s["shocks"] * w for s, w in zip(signatures, weights))),
+        "g_counts": sum(s["g_counts"] * w for s, w in zip(signatures, weights)),
+        "cycle_range": cycles["range"],
+        "cycle_mean": cycles["mean"],
+        "cycle_count": cycles["count"],
+        "cycle_resolution": cycles["resolution"],
+        "psd_frequencies": signatures[0]["psd_frequencies"],
+        "psd": sum(s["psd"] * h for s, h in zip(signatures, hours)) / total_hours if total_hours else signatures[0]["psd"],
+        "sample_seconds": signatures[0]["sample_seconds"],
+    }
+
+
+def cycle_matrix(signature, distance_km=None):
+    """Rainflow cycle matrix of a signature, optionally scaled to another route length"""
+    weight = 1.0 if distance_km is None else distance_km / signature["distance_km"]
+    return {
+        "range": signature["cycle_range"],
+        "mean": signature["cycle_mean"],
+        "count": signature["cycle_count"] * weight,
+        "samples": signature["samples"] * weight,
+        "resolution": signature["cycle_resolution"],
+    }
+
+
+def scale_signature(signature, distance_km):
+    """Signature of the same route driven over a different distance"""
+    return compose_signatures([(signature, distance_km)])
+
+
+def g_quantiles(signature, quantiles=(0.5, 0.95, 0.99)):
+    """g levels below which the given fractions of the route's samples lie"""
+    counts = np.asarray(signature["g_counts"], dtype=np.float64)
+    cumulative = np.cumsum(counts) / max(counts.sum(), 1e-12)
+    upper_edges = G_HISTOGRAM_EDGES[1:]
+    return {q: float(upper_edges[min(np.searchsorted(cumulative, q), len(upper_edges) - 1)]) for q in quantiles}
+
+
+def summarize(signature):
+    """Headline statistics of a signature for the results views"""
+    return {
+        "distance_km": signature["distance_km"],
+        "hours": signature["hours"],
+        "max_g": signature["max_g"],
+        "shock_rate_per_100km": signature["shocks"] * 100.0 / signature["distance_km"] if signature["distance_km"] else 0.0,
+        "g_quantiles": {f"p{int(q * 100)}": value for q, value in g_quantiles(signature).items()},
+        "g_edges": G_HISTOGRAM_EDGES,
+        "g_counts": np.asarray(signature["g_counts"], dtype=np.float64),
+    }
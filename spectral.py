@@ -0,0 +1,143 @@
+# DesignEdge.AI - Spectral analysis
+#
+# Welch power spectral density estimates computed over chunked input: the
+# accumulator frames whatever full segments the buffered samples allow, adds
+# their windowed periodograms to a running sum and keeps only the partial
+# segment for the next chunk, so arbitrarily long histories are processed in
+# bounded memory. Transport histories are sampled per distance, not per time;
+# uniform_time_chunks() resamples them onto a uniform time grid chunk by
+# chunk. Equivalent test spectra follow the usual time-compression practice
+# (MIL-STD-810 / ASTM D4169 style): a reference truck spectrum shape scaled to
+# the field RMS level raised by (field time / test time)^(1/m).
+
+import numpy as np
+
+WELCH_SEGMENT = 256            # Samples per Welch segment
+WELCH_OVERLAP = 0.5            # Fraction of a segment shared with the next one
+RESAMPLE_CHUNK = 1 << 18       # Distance samples resampled per chunk
+
+# Reference truck vibration spectrum (frequency Hz, PSD g^2/Hz), ASTM D4169 truck profile shape
+TRUCK_PSD_BREAKPOINTS = ((1.0, 0.0001), (4.0, 0.01), (16.0, 0.01), (40.0, 0.001), (80.0, 0.001), (200.0, 0.00001))
+TIME_COMPRESSION_EXPONENT = 7.5   # Fatigue exponent m of the time-compression rule
+DEFAULT_TEST_MINUTES = 60.0
+MAX_TEST_GRMS = 5.0               # Cap on derived test levels (the vibration test range)
+
+
+class WelchAccumulator:
+    """Streaming Welch PSD estimate (one-sided, mean removed per segment, Hann window)"""
+
+    def __init__(self, sample_rate, segment=WELCH_SEGMENT, overlap=WELCH_OVERLAP):
+        self.sample_rate = float(sample_rate)
+        self.segment = int(segment)
+        self.step = max(1, int(round(self.segment * (1.0 - overlap))))
+        self.window = np.hanning(self.segment)
+        self._scale = 1.0 / (self.sample_rate * np.sum(self.window ** 2))
+        self._buffer = np.empty(0)
+        self._sum = np.zeros(self.segment // 2 + 1)
+        self.segments = 0
+        self.samples = 0
+
+    def add(self, chunk):
+        """Process the next part of the signal"""
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        self.samples += chunk.size
+        buffer = np.concatenate([self._buffer, chunk])
+        count = 0 if buffer.size < self.segment else (buffer.size - self.segment) // self.step + 1
+        if count:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.segment)[::self.step][:count]
+            frames = frames - frames.mean(axis=1, keepdims=True)
+            spectra = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+            self._sum += spectra.sum(axis=0)
+            self.segments += count
+        # Keep the samples the next segment starts from
+        self._buffer = buffer[count * self.step:].copy()
+
+    def psd(self):
+        """(frequencies in Hz, PSD in signal units^2/Hz); None before the first full segment"""
+        if not self.segments:
+            return None
+        density = self._sum / self.segments * self._scale
+        # One-sided: double everything except DC (and Nyquist for even segments)
+        density[1:-1 if self.segment % 2 == 0 else None] *= 2.0
+        return np.fft.rfftfreq(self.segment, d=1.0 / self.sample_rate), density
+
+
+def welch_psd(signal, sample_rate, segment=WELCH_SEGMENT, overlap=WELCH_OVERLAP, chunk_size=RESAMPLE_CHUNK):
+    """Welch PSD of a complete signal, fed in chunks; the segment shrinks for short signals"""
+    signal = np.asarray(signal, dtype=np.float64).ravel()
+    accumulator = WelchAccumulator(sample_rate, min(segment, max(signal.size, 2)), overlap)
+    for start in range(0, signal.size, chunk_size):
+        accumulator.add(signal[start:start + chunk_size])
+    return accumulator.psd()
+
+
+def band_rms(frequencies, psd, f_min=None, f_max=None):
+    """RMS level of a PSD over a frequency band (square root of the band area)"""
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    psd = np.asarray(psd, dtype=np.float64)
+    mask = np.ones(frequencies.size, dtype=bool)
+    if f_min is not None:
+        mask &= frequencies >= f_min
+    if f_max is not None:
+        mask &= frequencies <= f_max
+    if mask.sum() < 2:
+        return 0.0
+    frequencies, psd = frequencies[mask], psd[mask]
+    return float(np.sqrt(np.sum(0.5 * (psd[1:] + psd[:-1]) * np.diff(frequencies))))
+
+
+def uniform_time_chunks(distance_km, speeds_kmh, values, sample_seconds, chunk_size=RESAMPLE_CHUNK):
+    """Resample a distance-sampled history onto a uniform time grid, yielding chunks
+
+    Travel time per distance step uses the mean speed of its end points.
+    """
+    distance_km = np.asarray(distance_km, dtype=np.float64)
+    speeds_kmh = np.maximum(np.asarray(speeds_kmh, dtype=np.float64), 1.0)
+    values = np.asarray(values, dtype=np.float64)
+
+    elapsed = 0.0        # Travel time (s) at the first sample of the current chunk
+    next_time = 0.0      # Next point of the uniform time grid
+    for start in range(0, distance_km.size - 1, chunk_size):
+        stop = min(start + chunk_size, distance_km.size - 1)
+        step_hours = np.diff(distance_km[start:stop + 1]) / (0.5 * (speeds_kmh[start:stop] + speeds_kmh[start + 1:stop + 1]))
+        times = elapsed + np.concatenate(([0.0], np.cumsum(step_hours) * 3600.0))
+        grid = np.arange(next_time, times[-1], sample_seconds)
+        if grid.size:
+            yield np.interp(grid, times, values[start:stop + 1])
+            next_time = grid[-1] + sample_seconds
+        elapsed = times[-1]
+
+
+def profile_psd(frequencies, breakpoints=TRUCK_PSD_BREAKPOINTS):
+    """Breakpoint spectrum evaluated at the given frequencies (log-log interpolation)"""
+    points = np.asarray(breakpoints, dtype=np.float64)
+    log_psd = np.interp(np.log(frequencies), np.log(points[:, 0]), np.log(points[:, 1]))
+    return np.exp(log_psd)
+
+
+def scaled_profile_psd(grms, frequency_range, points=200, breakpoints=TRUCK_PSD_BREAKPOINTS):
+    """Reference spectrum shape over `frequency_range`, scaled to the given band RMS level"""
+    f_min, f_max = frequency_range
+    frequencies = np.geomspace(f_min, f_max, points)
+    shape = profile_psd(frequencies, breakpoints)
+    shape_rms = band_rms(frequencies, shape)
+    psd = shape * (grms / shape_rms) ** 2 if shape_rms > 0 else shape
+    return {"frequencies": frequencies, "psd": psd, "grms": grms}
+
+
+def equivalent_test_psd(field_grms, field_hours, frequency_range, test_minutes=DEFAULT_TEST_MINUTES,
+                        exponent=TIME_COMPRESSION_EXPONENT, points=200):
+    """Test spectrum over `frequency_range` with the fatigue damage of `field_hours` at `field_grms`
+
+    The field level is raised by the time-compression factor (T_field / T_test)^(1/m),
+    capped at MAX_TEST_GRMS, and applied to the reference truck shape.
+    """
+    compression = max(field_hours * 60.0 / test_minutes, 1.0) ** (1.0 / exponent)
+    test = scaled_profile_psd(min(field_grms * compression, MAX_TEST_GRMS), frequency_range, points)
+    test.update({
+        "field_grms": field_grms,
+        "field_hours": field_hours,
+        "test_minutes": test_minutes,
+        "compression_factor": compression,
+    })
+    return test
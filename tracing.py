@@ -0,0 +1,221 @@
+# DesignEdge.AI - Performance tracing
+#
+# Lightweight hierarchical timing spans. A trace covers one Streamlit script
+# run; span() calls nest through a thread-local stack, so every session
+# (Streamlit runs each session's script in its own thread) builds its own
+# tree. Without an active trace span() returns a shared no-op context
+# manager, so instrumentation left in hot paths costs a thread-local lookup.
+# Traces export as a JSON span tree or in Chrome trace event format
+# (chrome://tracing, Perfetto).
+
+import os
+import time
+import threading
+import functools
+import contextlib
+
+TRACING_ENABLED = os.getenv("DESIGNEDGE_TRACING", "0") == "1"
+
+_local = threading.local()
+
+
+class _NoopSpan:
+    """Stand-in returned by span() when no trace is active"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed region: name, category, attributes and child spans"""
+
+    __slots__ = ("name", "category", "attrs", "start", "end", "thread", "children", "_trace")
+
+    def __init__(self, trace, name, category, attrs):
+        self._trace = trace
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.start = None
+        self.end = None
+        self.thread = threading.get_ident()
+        self.children = []
+
+    def __enter__(self):
+        stack = self._trace._stack
+        stack[-1].children.append(self)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        self._trace._stack.pop()
+        if exc_type is not None:
+            # Streamlit's rerun/stop signals end spans through exceptions as well
+            self.attrs["exception"] = exc_type.__name__
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes (e.g. sizes or cache hits) to the span"""
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    @property
+    def self_time(self):
+        """Duration not covered by child spans"""
+        return max(self.duration - sum(child.duration for child in self.children), 0.0)
+
+
+class Trace:
+    """Span tree of one script run"""
+
+    def __init__(self, name, **attrs):
+        self.wall_start = time.time()
+        self.root = Span(self, name, "run", attrs)
+        self.root.start = time.perf_counter()
+        self._stack = [self.root]
+
+    def finish(self):
+        self.root.end = time.perf_counter()
+        del self._stack[1:]
+
+    def add_span(self, name, start_wall, end_wall, category="external", **attrs):
+        """Record a span timed elsewhere (e.g. in a worker process) from wall-clock timestamps"""
+        span = Span(self, name, category, attrs)
+        span.thread = "external"
+        span.start = self.root.start + (start_wall - self.wall_start)
+        span.end = self.root.start + (end_wall - self.wall_start)
+        self._stack[-1].children.append(span)
+        return span
+
+    def walk(self):
+        """(depth, span) pairs in depth-first order, children sorted by start time"""
+        pending = [(0, self.root)]
+        while pending:
+            depth, span = pending.pop()
+            yield depth, span
+            for child in sorted(span.children, key=lambda child: child.start, reverse=True):
+                pending.append((depth + 1, child))
+
+    def category_totals(self):
+        """Self time (s) per span category, largest first"""
+        totals = {}
+        for _, span in self.walk():
+            totals[span.category] = totals.get(span.category, 0.0) + span.self_time
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def to_dict(self):
+        """Nested span tree with times in milliseconds relative to the start of the run"""
+        def convert(span):
+            return {
+                "name": span.name,
+                "category": span.category,
+                "start_ms": (span.start - self.root.start) * 1e3,
+                "duration_ms": span.duration * 1e3,
+                "attrs": {key: _json_safe(value) for key, value in span.attrs.items()},
+                "children": [convert(child) for child in sorted(span.children, key=lambda child: child.start)],
+            }
+        return {"started": self.wall_start, "root": convert(self.root)}
+
+    def to_chrome_trace(self):
+        """Chrome trace event format ("X" complete events, microseconds)"""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for _, span in self.walk():
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (self.wall_start + (span.start - self.root.start)) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": {key: _json_safe(value) for key, value in span.attrs.items()},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _json_safe(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def current_trace():
+    """Trace active in this thread, or None"""
+    return getattr(_local, "trace", None)
+
+
+def start_trace(name, **attrs):
+    """Start collecting spans in this thread"""
+    trace = Trace(name, **attrs)
+    _local.trace = trace
+    return trace
+
+
+def end_trace():
+    """Stop collecting spans in this thread and return the finished trace (None if none was active)"""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    if trace is not None:
+        trace.finish()
+    return trace
+
+
+@contextlib.contextmanager
+def trace(name, enabled=None, **attrs):
+    """Trace the enclosed block (yields None when tracing is disabled)"""
+    if not (TRACING_ENABLED if enabled is None else enabled):
+        yield None
+        return
+    active = start_trace(name, **attrs)
+    try:
+        yield active
+    finally:
+        end_trace()
+
+
+def span(name, category="app", **attrs):
+    """Timed region in the active trace; a shared no-op when no trace is active"""
+    active = getattr(_local, "trace", None)
+    if active is None:
+        return _NOOP_SPAN
+    return Span(active, name, category, attrs)
+
+
+def add_span(name, start_wall, end_wall, category="external", **attrs):
+    """Record an externally timed span in the active trace (ignored when no trace is active)"""
+    active = getattr(_local, "trace", None)
+    if active is not None and start_wall is not None and end_wall is not None:
+        active.add_span(name, start_wall, end_wall, category, **attrs)
+
+
+def traced(name=None, category="app"):
+    """Decorator running a function inside a span"""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,345 @@
+# DesignEdge.AI - Recorded track import
+#
+# Imports GPS logs of real shipments (GPX, or CSV with latitude / longitude
+# and optional elevation, speed and time columns) so transport analyses can
+# replay a recorded lane instead of synthetic terrain. Files are parsed as a
+# stream (GPX with iterparse, CSV in pandas chunks) and each column is
+# appended to a raw float64 file under data/tracks/<key>, together with the
+# cumulative haversine distance; later loads memory-map those files, so logs
+# with tens of millions of points never have to fit in memory. Replays
+# resample the track onto a uniform distance grid chunk by chunk and derive
+# vertical and longitudinal acceleration with finite differences.
+
+import os
+import json
+import shutil
+import hashlib
+import datetime
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+TRACK_DIR = os.path.join(os.getenv("DESIGNEDGE_DATA_DIR", "data"), "tracks")
+TRACK_SOURCE_DIR = os.getenv("DESIGNEDGE_TRACK_DIR", "tracks")   # Local GPX/CSV logs offered in the app
+TRACK_EXTENSIONS = (".gpx", ".csv")
+TRACK_COLUMNS = ("lat", "lon", "ele", "speed", "time", "distance")
+IMPORT_CHUNK = 1 << 16          # Points parsed and written per chunk
+RESAMPLE_CHUNK = 1 << 18        # Grid points interpolated per chunk
+
+TRACK_GRID_M = 25.0             # Spacing of the uniform distance grid
+ELEVATION_SMOOTHING_M = 200.0   # Moving-average window removing GPS elevation noise before differencing
+SPEED_SMOOTHING_M = 100.0       # Moving-average window of speeds derived from timestamps
+DEFAULT_SPEED_KMH = 60.0        # Speed assumed for tracks with neither speeds nor timestamps
+MIN_SPEED_KMH = 1.0
+EARTH_RADIUS_M = 6371008.8
+GRAVITY = 9.81
+
+# Accepted CSV header names per column (case-insensitive); CSV speeds are km/h unless named *_mps
+CSV_ALIASES = {
+    "lat": ("lat", "latitude"),
+    "lon": ("lon", "lng", "long", "longitude"),
+    "ele": ("ele", "elevation", "alt", "altitude", "elevation_m", "altitude_m"),
+    "speed_kmh": ("speed", "speed_kmh", "speed_kph"),
+    "speed_mps": ("speed_mps", "speed_ms"),
+    "time": ("time", "timestamp", "datetime"),
+}
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres between coordinate arrays (degrees)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin(0.5 * (lat2 - lat1)) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(0.5 * (lon2 - lon1)) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def file_key(path):
+    """Content hash of a track file (read in blocks)"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def _parse_time(text):
+    """Epoch seconds of an ISO 8601 timestamp (NaN when missing or malformed)"""
+    if not text:
+        return np.nan
+    try:
+        return datetime.datetime.fromisoformat(text.strip().replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return np.nan
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_gpx_points(path, chunk_size=IMPORT_CHUNK):
+    """Track points of a GPX file as column chunks; speeds in GPX are m/s"""
+    columns = {name: [] for name in ("lat", "lon", "ele", "speed", "time")}
+    segment = None
+    events = ET.iterparse(path, events=("start", "end"))
+    while True:
+        try:
+            event, element = next(events)
+        except StopIteration:
+            break
+        except ET.ParseError as e:
+            raise ValueError(f"Malformed GPX file {os.path.basename(path)}: {e}") from e
+
+        if event == "start":
+            if _local_name(element.tag) == "trkseg":
+                segment = element
+            continue
+        if _local_name(element.tag) != "trkpt":
+            continue
+        children = {_local_name(child.tag): child.text for child in element.iter() if child is not element}
+        columns["lat"].append(float(element.get("lat")))
+        columns["lon"].append(float(element.get("lon")))
+        columns["ele"].append(float(children["ele"]) if children.get("ele") else np.nan)
+        columns["speed"].append(float(children["speed"]) * 3.6 if children.get("speed") else np.nan)
+        columns["time"].append(_parse_time(children.get("time")))
+        # Drop the parsed points so memory stays bounded
+        (segment if segment is not None else element).clear()
+
+        if len(columns["lat"]) >= chunk_size:
+            yield {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+            columns = {name: [] for name in columns}
+    if columns["lat"]:
+        yield {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+
+
+def iter_csv_points(path, chunk_size=IMPORT_CHUNK):
+    """Track points of a CSV file as column chunks"""
+    header = pd.read_csv(path, nrows=0).columns
+    lookup = {str(column).strip().lower(): column for column in header}
+    found = {name: next((lookup[alias] for alias in aliases if alias in lookup), None)
+             for name, aliases in CSV_ALIASES.items()}
+    if found["lat"] is None or found["lon"] is None:
+        raise ValueError("Track CSV needs latitude and longitude columns")
+
+    usecols = [column for column in found.values() if column is not None]
+    for frame in pd.read_csv(path, usecols=usecols, chunksize=chunk_size):
+        def column(name):
+            return pd.to_numeric(frame[found[name]], errors="coerce").to_numpy(dtype=np.float64)
+
+        size = len(frame)
+        if found["speed_mps"] is not None:
+            speed = column("speed_mps") * 3.6
+        elif found["speed_kmh"] is not None:
+            speed = column("speed_kmh")
+        else:
+            speed = np.full(size, np.nan)
+        if found["time"] is not None:
+            times = pd.to_datetime(frame[found["time"]], errors="coerce", utc=True)
+            time = (times - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype=np.float64)
+        else:
+            time = np.full(size, np.nan)
+
+        yield {
+            "lat": column("lat"),
+            "lon": column("lon"),
+            "ele": column("ele") if found["ele"] is not None else np.full(size, np.nan),
+            "speed": speed,
+            "time": time,
+        }
+
+
+def import_track(path, name=None, root=TRACK_DIR):
+    """Parse a GPX/CSV track into memory-mappable columns; returns its key (imports are reused by content)"""
+    key = file_key(path)
+    meta = load_track_meta(key, root)
+    if meta is not None:
+        _check_track_length(meta["name"], meta["length_km"] * 1000.0)
+        return key
+
+    points = iter_gpx_points if path.lower().endswith(".gpx") else iter_csv_points
+    directory = os.path.join(root, key)
+    staging = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(staging, exist_ok=True)
+
+    files = {column: open(os.path.join(staging, f"{column}.f8"), "wb") for column in TRACK_COLUMNS}
+    count = 0
+    distance = 0.0
+    previous = None
+    has = {"ele": False, "speed": False, "time": False}
+    try:
+        for chunk in points(path):
+            valid = np.isfinite(chunk["lat"]) & np.isfinite(chunk["lon"])
+            chunk = {column: values[valid] for column, values in chunk.items()}
+            if not chunk["lat"].size:
+                continue
+
+            # Cumulative distance, carried over from the last point of the previous chunk
+            lat = chunk["lat"] if previous is None else np.concatenate(([previous[0]], chunk["lat"]))
+            lon = chunk["lon"] if previous is None else np.concatenate(([previous[1]], chunk["lon"]))
+            steps = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+            if previous is None:
+                steps = np.concatenate(([0.0], steps))
+            chunk["distance"] = distance + np.cumsum(steps)
+            distance = float(chunk["distance"][-1])
+            previous = (float(chunk["lat"][-1]), float(chunk["lon"][-1]))
+
+            for column in has:
+                has[column] |= bool(np.isfinite(chunk[column]).any())
+            for column in TRACK_COLUMNS:
+                files[column].write(np.ascontiguousarray(chunk[column], dtype=np.float64).tobytes())
+            count += chunk["lat"].size
+    except BaseException:
+        for f in files.values():
+            f.close()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        for f in files.values():
+            f.close()
+
+    try:
+        if count < 2:
+            raise ValueError(f"Track {os.path.basename(path)} has fewer than two valid points")
+        _check_track_length(os.path.basename(path), distance)
+    except ValueError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    meta = {
+        "key": key,
+        "name": name or os.path.basename(path),
+        "points": count,
+        "length_km": distance / 1000.0,
+        "has_elevation": has["ele"],
+        "has_speed": has["speed"],
+        "has_time": has["time"],
+    }
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.replace(staging, directory)
+    except OSError:
+        # Imported concurrently by another process: keep that copy
+        shutil.rmtree(staging, ignore_errors=True)
+    return key
+
+
+def _check_track_length(name, distance_m):
+    # Replay differentiates over a TRACK_GRID_M grid, which needs at least two grid points
+    if distance_m < TRACK_GRID_M:
+        raise ValueError(f"Track {name} covers only {distance_m:.1f} m; at least {TRACK_GRID_M:.0f} m of "
+                         "travel is needed to replay it (was the logger stationary?)")
+
+
+def load_track_meta(key, root=TRACK_DIR):
+    """Metadata of an imported track, or None if it is missing"""
+    try:
+        with open(os.path.join(root, key, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_track(key, root=TRACK_DIR):
+    """Imported track: metadata plus its columns as read-only memory maps"""
+    meta = load_track_meta(key, root)
+    if meta is None:
+        raise KeyError(f"Track {key} has not been imported")
+    columns = {column: np.memmap(os.path.join(root, key, f"{column}.f8"), dtype=np.float64, mode="r",
+                                 shape=(meta["points"],))
+               for column in TRACK_COLUMNS}
+    return dict(meta, columns=columns)
+
+
+def list_track_sources(directory=TRACK_SOURCE_DIR):
+    """GPX/CSV files available for import in the local track directory"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(TRACK_EXTENSIONS))
+
+
+def _fill_gaps(values, fallback):
+    """Interpolate NaNs from the neighbouring valid values (fallback when none are valid)"""
+    valid = np.isfinite(values)
+    if valid.all():
+        return values
+    if not valid.any():
+        return np.full(values.shape, fallback)
+    index = np.arange(values.size)
+    return np.interp(index, index[valid], values[valid])
+
+
+def _moving_average(values, window):
+    """Centred moving average over `window` samples, edges padded with the end values"""
+    window = int(window) | 1
+    if window <= 1 or values.size < 2:
+        return values
+    padded = np.pad(values, window // 2, mode="edge")
+    return np.convolve(padded, np.ones(window) / window, mode="valid")
+
+
+def resample_track(track, step_m=TRACK_GRID_M, chunk_size=RESAMPLE_CHUNK):
+    """Track columns interpolated onto a uniform distance grid
+
+    Only the part of the memory-mapped source spanning each grid chunk is read.
+    Returns distance (m) and elevation (m), speed (km/h) and time (s) per grid
+    point; missing values are NaN.
+    """
+    source = track["columns"]
+    distance = source["distance"]
+    grid = np.arange(0.0, float(distance[-1]) + 0.5 * step_m, step_m)
+    resampled = {column: np.full(grid.size, np.nan) for column in ("ele", "speed", "time")}
+
+    for start in range(0, grid.size, chunk_size):
+        stop = min(start + chunk_size, grid.size)
+        first = max(int(np.searchsorted(distance, grid[start], side="right")) - 1, 0)
+        last = min(int(np.searchsorted(distance, grid[stop - 1], side="left")) + 1, distance.size)
+        window = np.asarray(distance[first:last])
+        # Stationary points (repeated distances) would make the interpolation ambiguous
+        moving = np.concatenate(([True], np.diff(window) > 0))
+        for column in resampled:
+            values = np.asarray(source[column][first:last])[moving]
+            valid = np.isfinite(values)
+            if valid.sum() >= 2:
+                resampled[column][start:stop] = np.interp(grid[start:stop], window[moving][valid], values[valid])
+
+    return dict(resampled, distance=grid)
+
+
+def track_accelerations(track, step_m=TRACK_GRID_M):
+    """Speed, elevation and accelerations (in g) along a track on a uniform distance grid
+
+    Vertical: cos(grade) plus the centripetal term v^2 z'' / g of the road
+    profile; longitudinal: v dv/dx / g plus the grade component sin(grade).
+    Speeds come from the log, else from timestamps, else DEFAULT_SPEED_KMH.
+    """
+    resampled = resample_track(track, step_m)
+    distance = resampled["distance"]
+
+    elevation = _moving_average(_fill_gaps(resampled["ele"], 0.0), ELEVATION_SMOOTHING_M / step_m)
+
+    speed_kmh = resampled["speed"]
+    if not np.isfinite(speed_kmh).any() and np.isfinite(resampled["time"]).sum() >= 2:
+        elapsed = _fill_gaps(resampled["time"], 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed_kmh = np.gradient(distance, elapsed) * 3.6
+        speed_kmh = _moving_average(np.where(np.isfinite(speed_kmh), speed_kmh, np.nan), SPEED_SMOOTHING_M / step_m)
+    speed_kmh = np.maximum(_fill_gaps(speed_kmh, DEFAULT_SPEED_KMH), MIN_SPEED_KMH)
+    speed_mps = speed_kmh / 3.6
+
+    edge_order = 2 if distance.size > 2 else 1
+    slope = np.gradient(elevation, step_m, edge_order=edge_order)
+    curvature = np.gradient(slope, step_m, edge_order=edge_order)
+    grade = np.arctan(slope)
+
+    vertical_g = np.cos(grade) + speed_mps ** 2 * curvature / GRAVITY
+    longitudinal_g = speed_mps * np.gradient(speed_mps, step_m, edge_order=edge_order) / GRAVITY + np.sin(grade)
+
+    return {
+        "distance_km": distance / 1000.0,
+        "speed_kmh": speed_kmh,
+        "elevation_m": elevation,
+        "vertical_g": vertical_g,
+        "longitudinal_g": longitudinal_g,
+        "hours": float(np.sum(np.diff(distance) / 1000.0 / (0.5 * (speed_kmh[1:] + speed_kmh[:-1])))),
+    }